@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: conversione PIL -> Qt.
+
+Confronta il vecchio percorso (PNG in BytesIO + QPixmap.loadFromData) con
+pil_to_qimage (buffer raw con stride esplicito) per le dimensioni usate
+dall'app: miniatura 280px, vista dettaglio 800px e un originale 4K.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_pil_to_qimage.py
+"""
+import io
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from PyQt6.QtGui import QGuiApplication, QPixmap
+
+from kparquet import pil_to_qimage
+
+SIZES = [(281, 211), (800, 600), (3840, 2160)]  # larghezze dispari di proposito (stride)
+
+
+def legacy_png_roundtrip(pil_image):
+    if pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    byte_arr = io.BytesIO()
+    pil_image.save(byte_arr, format='PNG')
+    qpix = QPixmap()
+    qpix.loadFromData(byte_arr.getvalue())
+    return qpix
+
+
+def direct_path(pil_image):
+    return QPixmap.fromImage(pil_to_qimage(pil_image))
+
+
+def timeit(fn, image, repeat):
+    fn(image)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(image)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    app = QGuiApplication(sys.argv)
+    print(f"{'size':>11} {'png (ms)':>10} {'raw (ms)':>10} {'speedup':>8}")
+    for w, h in SIZES:
+        image = Image.effect_noise((w, h), 64).convert("RGB")
+        # Controllo di correttezza: stessi pixel, nessuno slittamento di riga
+        qimg = pil_to_qimage(image)
+        for x, y in ((0, 0), (w - 1, h - 1), (w // 2, h // 3)):
+            r, g, b = image.getpixel((x, y))
+            c = qimg.pixelColor(x, y)
+            assert (c.red(), c.green(), c.blue()) == (r, g, b), f"pixel diverso a {(x, y)}"
+        repeat = 50 if w * h < 1_000_000 else 5
+        old = timeit(legacy_png_roundtrip, image, repeat)
+        new = timeit(direct_path, image, repeat)
+        print(f"{f'{w}x{h}':>11} {old:10.2f} {new:10.2f} {old / new:7.1f}x")
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Benchmark end-to-end dell'applicazione su dataset sintetici (vedi synthetic.py).
+
+Per ogni configurazione (modalità, righe, dimensione immagini, row group, backend)
+la finestra principale gira in un processo separato con Qt offscreen, cache e
+impostazioni vuote, e misura: apertura del file (griglia sul primo row group e
+metadati completi), tempo alla prima pagina, cambio pagina a freddo e a caldo,
+ricerca, ordinamento e picco di memoria.
+Le latenze per fase arrivano dalla strumentazione dell'app (kparquet.PERF).
+I risultati sono scritti in JSON per confrontare esecuzioni diverse.
+
+    python benchmarks/bench_suite.py --preset quick --output results.json
+    python benchmarks/bench_suite.py --modes path --rows 1000000 --image-size 256 --row-group 100000
+    python benchmarks/bench_suite.py --compare before.json after.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# (modalità, righe, lato immagine, righe per row group); in modalità bytes le immagini
+# stanno nel file, quindi le combinazioni grandi restano su immagini piccole
+PRESETS = {
+    "quick": [("bytes", 10000, 512, 10000), ("path", 10000, 512, 10000)],
+    "default": [("bytes", 10000, 256, 1000), ("bytes", 10000, 1024, 1000), ("bytes", 100000, 256, 10000),
+                ("path", 10000, 512, 10000), ("path", 100000, 512, 10000)],
+    "full": [("bytes", 10000, 256, 1000), ("bytes", 10000, 1024, 1000), ("bytes", 100000, 256, 10000),
+             ("bytes", 1000000, 128, 10000), ("path", 10000, 512, 10000), ("path", 100000, 512, 10000),
+             ("path", 1000000, 256, 100000)],
+}
+SEARCH_QUERIES = ("dog", "sunset beach", "#12", "zzzz")
+SORT_COLUMNS = ("aesthetic_score", "created_at", "caption")
+FLIPS = 10
+TIMEOUT_S = 300
+
+
+# --- PROCESSO FIGLIO: una configurazione ---
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": values[-1], "n": len(values)}
+
+
+def peak_rss_mb():
+    # VmHWM è il picco di questo processo; ru_maxrss su Linux eredita quello del
+    # padre al fork e sopravvive all'exec (il padre ha appena generato i dataset)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss è in KB su Linux, in byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def run_one(cfg, path):
+    from PyQt6.QtCore import QSettings
+    from PyQt6.QtWidgets import QApplication
+    import kparquet
+
+    kparquet.PERF.enabled = True
+    app = QApplication(sys.argv[:1])
+    # Impostazioni isolate (XDG_CONFIG_HOME temporaneo): qui si sceglie solo il backend
+    QSettings(kparquet.ORG_NAME, kparquet.APP_NAME).setValue("decode_backend", cfg["backend"])
+
+    def wait_until(cond):
+        start = time.perf_counter()
+        while not cond():
+            if time.perf_counter() - start > TIMEOUT_S:
+                raise TimeoutError("timeout")
+            app.processEvents()
+            time.sleep(0.001)
+
+    def stage_count(name):
+        return kparquet.PERF.snapshot()["stages"].get(name, {}).get("count", 0)
+
+    window = kparquet.MainWindow()
+    window.resize(1400, 900)
+    window.show()
+    app.processEvents()
+    result = {"rss_start_mb": kparquet.PERF.rss_mb()}
+
+    # L'apertura è asincrona: prima la griglia sul primo row group, poi i metadati completi
+    start = time.perf_counter()
+    window.load_parquet(path)
+    wait_until(lambda: window.dataset is not None)
+    result["preview_s"] = time.perf_counter() - start
+    wait_until(lambda: window.meta_table is not None)
+    result["open_s"] = time.perf_counter() - start
+    result["rss_open_mb"] = kparquet.PERF.rss_mb()
+    wait_until(lambda: not window.page_workers)
+    result["first_page_s"] = time.perf_counter() - start
+
+    # Pagine a caso, lontane tra loro: nessuna è già stata decodificata o prefetchata
+    rng = random.Random(0)
+    pages = rng.sample(range(2, window.total_pages + 1), min(FLIPS, window.total_pages - 1))
+    for label in ("flip_cold_ms", "flip_warm_ms"):
+        latencies = []
+        for page in pages:
+            start = time.perf_counter()
+            window.load_page(page)
+            wait_until(lambda: not window.page_workers)
+            latencies.append((time.perf_counter() - start) * 1000)
+        result[label] = percentiles(latencies)
+
+    result["search_ms"] = {}
+    for query in SEARCH_QUERIES:
+        before = stage_count("search.apply")
+        window.search_bar.blockSignals(True)
+        window.search_bar.setText(query)
+        window.search_bar.blockSignals(False)
+        start = time.perf_counter()
+        window.perform_search()
+        wait_until(lambda: stage_count("search.apply") > before)
+        result["search_ms"][query] = {"ms": (time.perf_counter() - start) * 1000, "rows": len(window.view_rows)}
+    window.search_bar.blockSignals(True)
+    window.search_bar.clear()
+    window.search_bar.blockSignals(False)
+    window.perform_search()
+
+    # Ordinamento a freddo (permutazione da calcolare) su tutto il dataset
+    result["sort_ms"] = {}
+    for column in SORT_COLUMNS:
+        index = window.combo_sort.findText(f"{column} ↑")
+        if index < 0: continue
+        start = time.perf_counter()
+        window.combo_sort.setCurrentIndex(index)
+        result["sort_ms"][column] = (time.perf_counter() - start) * 1000
+
+    window.cancel_page_workers()
+    window.cancel_prefetch()
+    window.threadpool.waitForDone()
+    window.search_pool.waitForDone()
+    snapshot = kparquet.PERF.snapshot()
+    result["stages"] = {name: {k: st[k] for k in ("count", "mean_ms", "p50_ms", "p95_ms", "max_ms")}
+                        for name, st in snapshot["stages"].items()}
+    result["caches"] = snapshot["caches"]
+    result["peak_rss_mb"] = peak_rss_mb()
+    window.close()
+    return result
+
+
+# --- PROCESSO PRINCIPALE ---
+def metadata():
+    import PIL
+    import pyarrow
+    from PyQt6.QtCore import QT_VERSION_STR
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "qt": QT_VERSION_STR,
+            "pyarrow": pyarrow.__version__, "pillow": PIL.__version__}
+
+
+def run_config(cfg, path):
+    # Cache e configurazione vuote per ogni esecuzione: misure a freddo e ripetibili
+    with tempfile.TemporaryDirectory(prefix="kparquet-bench-") as tmp:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+                   XDG_CACHE_HOME=os.path.join(tmp, "cache"), XDG_CONFIG_HOME=os.path.join(tmp, "config"))
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(cfg), path],
+                              env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["errore sconosciuto"])[-1]}
+    return json.loads(lines[-1])
+
+
+def summary_line(name, r):
+    if "error" in r:
+        return f"{name:34} ERRORE: {r['error']}"
+    flip = r["flip_cold_ms"] or {}
+    search = max((s["ms"] for s in r["search_ms"].values()), default=0)
+    sort = max(r["sort_ms"].values(), default=0)
+    return (f"{name:34} open {r['open_s']:6.2f}s  first {r['first_page_s']:6.2f}s  "
+            f"flip p50 {flip.get('p50', 0):7.1f}ms  search max {search:7.1f}ms  "
+            f"sort max {sort:7.1f}ms  peak {r['peak_rss_mb']:6.0f}MB")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {r["name"]: r for r in json.load(f)["results"]}
+    metrics = (("preview_s", lambda r: r["preview_s"]), ("open_s", lambda r: r["open_s"]),
+               ("first_page_s", lambda r: r["first_page_s"]),
+               ("flip_cold_p50", lambda r: r["flip_cold_ms"]["p50"]),
+               ("flip_warm_p50", lambda r: r["flip_warm_ms"]["p50"]),
+               ("search_max", lambda r: max(s["ms"] for s in r["search_ms"].values())),
+               ("sort_max", lambda r: max(r["sort_ms"].values())), ("peak_rss_mb", lambda r: r["peak_rss_mb"]))
+    for name in sorted(old.keys() & new.keys()):
+        print(name)
+        for label, get in metrics:
+            try:
+                a, b = get(old[name]), get(new[name])
+            except (KeyError, TypeError, ValueError):
+                continue
+            print(f"  {label:15} {a:10.2f} -> {b:10.2f}  ({b / a if a else float('inf'):5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end su dataset parquet sintetici.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--modes", nargs="+", choices=("bytes", "path"), help="sostituisce il preset")
+    parser.add_argument("--rows", nargs="+", type=int)
+    parser.add_argument("--image-size", nargs="+", type=int)
+    parser.add_argument("--row-group", nargs="+", type=int)
+    parser.add_argument("--backend", nargs="+", choices=("thread", "process"), default=["thread"])
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"),
+                        help="dove generare (e riusare) i dataset")
+    parser.add_argument("--output", help="file JSON dei risultati")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="confronta due file di risultati")
+    parser.add_argument("--run-one", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        cfg, path = json.loads(args.run_one[0]), args.run_one[1]
+        print(json.dumps(run_one(cfg, path)))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from synthetic import dataset_name, generate
+
+    if args.modes or args.rows or args.image_size or args.row_group:
+        configs = list(itertools.product(args.modes or ["bytes", "path"], args.rows or [10000],
+                                         args.image_size or [512], args.row_group or [10000]))
+    else:
+        configs = PRESETS[args.preset]
+
+    results = []
+    for (mode, rows, size, row_group), backend in itertools.product(configs, args.backend):
+        started = time.perf_counter()
+        path = generate(args.data_dir, mode, rows, size, row_group)
+        generated = time.perf_counter() - started
+        cfg = {"mode": mode, "rows": rows, "image_size": size, "row_group_size": row_group, "backend": backend}
+        name = f"{dataset_name(mode, rows, size, row_group)}-{backend}"
+        if generated > 1:
+            print(f"{name}: dataset generato in {generated:.1f}s", file=sys.stderr)
+        result = run_config(cfg, path)
+        results.append({"name": name, "config": cfg, "file_mb": os.path.getsize(path) / 2 ** 20, **result})
+        print(summary_line(name, result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+        print(f"Risultati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
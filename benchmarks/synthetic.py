@@ -0,0 +1,111 @@
+"""
+Dataset parquet sintetici e riproducibili per i benchmark.
+
+- modalità 'bytes': colonna 'image' come struct HuggingFace {'bytes', 'path'};
+- modalità 'path': colonna 'file_path' con immagini JPEG scritte su disco.
+
+Le immagini sono un pool di POOL_SIZE JPEG diversi ripetuti ciclicamente: il
+costo di decodifica è quello reale, ma 1M di righe non richiede 1M di encode.
+I metadati (caption, dimensioni, punteggio, data) sono generati con seme fisso,
+quindi lo stesso comando produce sempre lo stesso file.
+
+    python benchmarks/synthetic.py --mode bytes --rows 100000 --image-size 512 --out /tmp/bench
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image
+
+POOL_SIZE = 64
+WORDS = ("dog cat sunset beach mountain city night portrait forest river car street flower "
+         "snow desert ocean bridge castle garden market train horse bird lake sky cloud").split()
+
+
+def make_images(count, size, seed):
+    # Sfumature a bassa risoluzione + rumore, ingrandite: comprimono come foto vere, non come rumore puro
+    rng = np.random.default_rng(seed)
+    w, h = size, size * 3 // 4
+    images = []
+    for _ in range(count):
+        base = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)).resize((w, h), Image.Resampling.BICUBIC)
+        noise = Image.effect_noise((w, h), 24).convert("RGB")
+        buf = io.BytesIO()
+        Image.blend(base, noise, 0.15).save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def dataset_name(mode, rows, image_size, row_group_size):
+    return f"{mode}-{rows}r-{image_size}px-rg{row_group_size}"
+
+
+def generate(out_dir, mode, rows, image_size, row_group_size, seed=0):
+    """Scrive (se non esiste già) il dataset e ne restituisce il percorso .parquet."""
+    name = dataset_name(mode, rows, image_size, row_group_size)
+    path = os.path.join(out_dir, f"{name}.parquet")
+    if os.path.exists(path):
+        return path
+    os.makedirs(out_dir, exist_ok=True)
+    pool = make_images(POOL_SIZE, image_size, seed)
+    if mode == "path":
+        image_dir = os.path.join(out_dir, f"images-{image_size}px")
+        os.makedirs(image_dir, exist_ok=True)
+        files = []
+        for i, data in enumerate(pool):
+            file = os.path.join(image_dir, f"img_{i:03d}.jpg")
+            if not os.path.exists(file):
+                with open(file, "wb") as f:
+                    f.write(data)
+            files.append(file)
+
+    rng = np.random.default_rng(seed + 1)
+    tmp = path + ".tmp"
+    writer = None
+    try:
+        # Un row group alla volta: la memoria resta limitata anche con 1M di righe
+        for start in range(0, rows, row_group_size):
+            n = min(row_group_size, rows - start)
+            ids = np.arange(start, start + n)
+            words = rng.integers(0, len(WORDS), (n, 6))
+            columns = {
+                "caption": pa.array([" ".join(WORDS[j] for j in row) + f" #{i}" for i, row in zip(ids, words)]),
+                "width": pa.array(rng.integers(256, 4096, n), type=pa.int32()),
+                "height": pa.array(rng.integers(256, 4096, n), type=pa.int32()),
+                "aesthetic_score": pa.array(rng.uniform(0, 10, n).round(3)),
+                "created_at": pa.array((1_600_000_000 + rng.integers(0, 10 ** 8, n)) * 10 ** 6,
+                                       type=pa.timestamp("us")),
+            }
+            if mode == "bytes":
+                columns["image"] = pa.array([{"bytes": pool[i % POOL_SIZE], "path": f"img_{i:08d}.jpg"} for i in ids],
+                                            type=pa.struct([("bytes", pa.binary()), ("path", pa.string())]))
+            else:
+                columns["file_path"] = pa.array([files[i % POOL_SIZE] for i in ids])
+            table = pa.table(columns)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un dataset parquet sintetico.")
+    parser.add_argument("--mode", choices=("bytes", "path"), default="bytes")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument("--row-group", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
+    args = parser.parse_args()
+    print(generate(args.out, args.mode, args.rows, args.image_size, args.row_group, args.seed))
+
+
+if __name__ == "__main__":
+    main()
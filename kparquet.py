@@ -1,46 +1,1209 @@
 import sys
 import io
+import atexit
 import os
+import re
+import glob
 import tempfile
-import pandas as pd
-from PIL import Image
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, 
-                             QScrollArea, QLabel, QFileDialog, QVBoxLayout, 
+import threading
+import time
+import hashlib
+import json
+import sqlite3
+import shutil
+import tarfile
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter, OrderedDict, defaultdict, deque
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from PIL import Image, ExifTags, features
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QListView,
+                             QLabel, QFileDialog, QVBoxLayout, 
                              QDialog, QTextEdit, QHBoxLayout, QProgressBar, 
-                             QToolBar, QStyle, QMessageBox, QStatusBar, 
-                             QLineEdit, QPushButton, QComboBox, QSlider, QSpinBox)
-from PyQt6.QtCore import Qt, QRunnable, QThreadPool, pyqtSignal, QObject, QSettings, QMimeData, QUrl, QPoint
-from PyQt6.QtGui import QPixmap, QAction, QColor, QPainter, QDrag, QIcon, QImage
+                             QToolBar, QStyle, QMessageBox, QStatusBar, QStyledItemDelegate,
+                             QLineEdit, QPushButton, QComboBox, QSlider, QSpinBox, QDockWidget,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox, QProgressDialog,
+                             QInputDialog)
+from PyQt6.QtCore import (Qt, QTimer, QRunnable, QThreadPool, pyqtSignal, QObject, QSettings, QMimeData, QUrl,
+                          QPoint, QSize, QStringListModel)
+from PyQt6.QtGui import QPixmap, QAction, QColor, QPainter, QPen, QDrag, QIcon, QImage, QImageReader
 
 
 # --- COSTANTI ---
 APP_NAME = "Parquet Media Manager 8.0"
 ORG_NAME = "KDEUser"
+ROW_GROUP_CACHE_MB = 512
+THUMB_SIZE = 280
+DETAIL_SIZE = 800  # Lato massimo dell'immagine nella finestra di dettaglio
+THUMB_CACHE_MB = 1024
+# WebP solo se lo scrive Pillow e lo legge Qt (il plugin immagini webp può mancare)
+THUMB_FORMAT = ("WEBP" if features.check("webp") and b"webp" in [bytes(f) for f in QImageReader.supportedImageFormats()]
+                else "JPEG")
+PIXMAP_CACHE_MB = 256
+PREFETCH_PAGES = 1
+DECODE_WORKERS = os.cpu_count() or 4
+DECODE_BACKEND = "thread"  # "thread" oppure "process"
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_CACHE_MB = 128  # Risultati di ricerca recenti (array di righe) tenuti in memoria
+INDEX_BLOCK_ROWS = 65536  # Righe per blocco nella costruzione dell'indice di ricerca
+INDEX_MAX_ROWS = 5_000_000  # Oltre, l'indice non si costruisce all'apertura (si usa solo se precalcolato)
+INDEX_CACHE_MB = 2048  # Limite degli indici salvati su disco (tutti i dataset insieme)
+EXPORT_WORKERS = min(8, os.cpu_count() or 4)  # Blocchi in lettura e file in scrittura contemporanei
+EXPORT_CHUNK_ROWS = 256  # Righe per blocco quando le immagini sono file su disco
+TRACE_MAX_EVENTS = 200000  # Eventi tenuti per l'export Chrome trace (i più vecchi si perdono)
+DETECT_SAMPLE_ROWS = 64    # Valori letti per colonna per riconoscere le colonne immagine
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+# Formato PIL -> (estensione, tipo MIME) per esportare i bytes originali
+IMAGE_FORMATS = {"JPEG": (".jpg", "image/jpeg"), "MPO": (".jpg", "image/jpeg"), "PNG": (".png", "image/png"),
+                 "WEBP": (".webp", "image/webp"), "GIF": (".gif", "image/gif"), "BMP": (".bmp", "image/bmp"),
+                 "TIFF": (".tif", "image/tiff"), "AVIF": (".avif", "image/avif"),
+                 "JPEG2000": (".jp2", "image/jp2"), "ICO": (".ico", "image/x-icon"), "TGA": (".tga", "image/x-tga")}
+
+# --- STRUMENTAZIONE ---
+class _NullSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+class _Span:
+    __slots__ = ("perf", "name", "args", "start")
+
+    def __init__(self, perf, name, args):
+        self.perf, self.name, self.args = perf, name, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perf.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+class Instrumentation:
+    """
+    Tempi per fase (istogrammi di latenza), hit rate delle cache e memoria del processo.
+    Disattivata costa un confronto per chiamata; attivata tiene anche gli ultimi
+    eventi per l'export in formato Chrome trace (chrome://tracing, Perfetto).
+    """
+    # Limiti superiori dei bucket, in ms
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+    _NULL = _NullSpan()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.epoch = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}  # nome -> [conteggio, totale s, max s, bucket, ultimi campioni]
+            self.caches = defaultdict(lambda: [0, 0])  # nome -> [hit, miss]
+            self.events = deque(maxlen=TRACE_MAX_EVENTS)
+
+    def span(self, name, **args):
+        return _Span(self, name, args) if self.enabled else self._NULL
+
+    def record(self, name, start, duration, args=None):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = [0, 0.0, 0.0, [0] * len(self.BUCKETS_MS), deque(maxlen=4096)]
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = max(stage[2], duration)
+            ms = duration * 1000
+            stage[3][next(i for i, b in enumerate(self.BUCKETS_MS) if ms <= b)] += 1
+            stage[4].append(duration)
+            self.events.append((name, start, duration, threading.get_ident(), args))
+
+    def hit(self, name, hits=1, misses=0):
+        if not self.enabled: return
+        with self._lock:
+            counts = self.caches[name]
+            counts[0] += hits
+            counts[1] += misses
+
+    @staticmethod
+    def rss_mb():
+        # /proc su Linux; altrove il picco da getrusage
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+        except (OSError, ValueError, IndexError):
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+    def snapshot(self):
+        """Statistiche correnti come dizionario serializzabile in JSON."""
+        with self._lock:
+            stages = {}
+            for name, (count, total, peak, buckets, samples) in sorted(self.stages.items()):
+                p50, p95, p99 = (np.percentile(np.fromiter(samples, float), [50, 95, 99]) * 1000).tolist()
+                stages[name] = {"count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count,
+                                "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": peak * 1000,
+                                "histogram": {("inf" if b == float("inf") else f"<={b}ms"): n
+                                              for b, n in zip(self.BUCKETS_MS, buckets)}}
+            caches = {name: {"hits": h, "misses": m, "hit_rate": h / (h + m) if h + m else None}
+                      for name, (h, m) in sorted(self.caches.items())}
+        return {"stages": stages, "caches": caches, "rss_mb": self.rss_mb()}
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def export_chrome_trace(self, path):
+        # Eventi "complete" (ph=X) in microsecondi, un tid per thread
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (start - self.epoch) * 1e6, "dur": duration * 1e6,
+                  "args": {k: str(v) for k, v in (args or {}).items()}}
+                 for name, start, duration, tid, args in events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+PERF = Instrumentation(enabled=os.environ.get("KPARQUET_TRACE", "") not in ("", "0"))
+
+# --- DATASET LAZY (ROW GROUP) ---
+def resolve_sources(source):
+    """
+    File singolo, cartella (ricorsiva), glob o lista di file -> (radice, path ordinati).
+    La radice è la cartella sopra le eventuali partizioni Hive (chiave=valore).
+    """
+    if isinstance(source, (list, tuple)):
+        paths = sorted(source)
+    elif os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "**", "*.parquet"), recursive=True))
+    elif glob.has_magic(source):
+        paths = sorted(p for p in glob.glob(source, recursive=True) if os.path.isfile(p))
+    else:
+        paths = [source]
+    # File di servizio (_SUCCESS, _common_metadata, .crc ...) esclusi
+    paths = [p for p in paths if not os.path.basename(p).startswith(("_", "."))]
+    if not paths:
+        raise FileNotFoundError(f"Nessun file parquet in {source}")
+    root = source if isinstance(source, str) and os.path.isdir(source) else \
+        os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    while "=" in os.path.basename(root):
+        root = os.path.dirname(root)
+    return root, paths
+
+class ParquetDataset:
+    """
+    Accesso lazy a uno o più file parquet (anche partizionati Hive) come un'unica
+    tabella con indice di riga globale: all'apertura legge solo i footer, in
+    parallelo, poi decodifica i row group su richiesta tenendone un LRU limitato in MB.
+    """
+    def __init__(self, source, cache_mb=ROW_GROUP_CACHE_MB):
+        # Percorsi assoluti: la sorgente si salva in 'last_file' e si riapre da un'altra cartella
+        source = [os.path.abspath(p) for p in source] if isinstance(source, (list, tuple)) else os.path.abspath(source)
+        self.source = source
+        self.root, self.paths = resolve_sources(source)
+        dataset = ds.dataset(self.paths, format="parquet", partitioning="hive",
+                             partition_base_dir=self.root)
+        self.fragments = list(dataset.get_fragments())
+        # Footer letti in parallelo: con centinaia di shard è la parte lenta dell'apertura
+        with ThreadPoolExecutor(max_workers=min(32, len(self.fragments))) as pool:
+            self.shard_meta = list(pool.map(self.read_footer, self.fragments))
+        self.partitions = [ds.get_partition_keys(f.partition_expression) or {} for f in self.fragments]
+        self.file_schema = pa.unify_schemas([m.schema.to_arrow_schema() for m in self.shard_meta])
+        self.schema = pa.unify_schemas([self.file_schema, dataset.partitioning.schema]) \
+            if dataset.partitioning is not None else self.file_schema
+        self.columns = self.schema.names
+        self.partition_columns = [c for c in self.columns if c not in self.file_schema.names]
+
+        # Tabella globale dei row group: (shard, row group locale) + offset della prima riga
+        self.row_groups = [(i, rg) for i, m in enumerate(self.shard_meta) for rg in range(m.num_row_groups)]
+        self.num_row_groups = len(self.row_groups)
+        self.rg_offsets = np.zeros(self.num_row_groups + 1, dtype=np.int64)
+        for g, (i, rg) in enumerate(self.row_groups):
+            self.rg_offsets[g + 1] = self.rg_offsets[g] + self.shard_meta[i].row_group(rg).num_rows
+        self.shard_first_rg = np.cumsum([0] + [m.num_row_groups for m in self.shard_meta])
+        self.num_rows = int(self.rg_offsets[-1])
+
+        self.cache_bytes = cache_mb * 1024 * 1024
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._inflight = {}  # chiave -> Future della lettura in corso
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read_footer(fragment):
+        fragment.ensure_complete_metadata()
+        return fragment.metadata
+
+    def open_shard(self, i):
+        # Il footer è già in memoria: riaprire il file costa solo un open()
+        return pq.ParquetFile(self.fragments[i].path, metadata=self.shard_meta[i])
+
+    def fingerprint(self, img_col):
+        # Cambia se un qualsiasi shard viene riscritto (mtime/size) o se cambia la colonna immagine
+        h = hashlib.sha1(f"{img_col}|{THUMB_SIZE}".encode())
+        for path in self.paths:
+            st = os.stat(path)
+            h.update(f"|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode())
+        return h.hexdigest()
+
+    def read_row_group(self, g, columns=None):
+        key = (g, tuple(columns) if columns is not None else None)
+        with self._lock:
+            table = self._cache.get(key)
+            if table is not None:
+                self._cache.move_to_end(key)
+                return table
+            # Lo stesso row group già in lettura (i blocchi di una pagina arrivano insieme): si aspetta quella
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return pending.result()
+        # Lettura fuori dal lock: i worker possono leggere shard diversi in parallelo
+        try:
+            shard, rg = self.row_groups[g]
+            pf = self.open_shard(shard)
+            names = pf.schema_arrow.names
+            table = pf.read_row_group(rg, columns=[c for c in columns if c in names] if columns is not None else None)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            if key not in self._cache:
+                self._cache[key] = table
+                self._cache_size += table.nbytes
+            # Evict LRU, ma teniamo sempre almeno l'ultimo row group letto
+            while self._cache_size > self.cache_bytes and len(self._cache) > 1:
+                _, old = self._cache.popitem(last=False)
+                self._cache_size -= old.nbytes
+        pending.set_result(table)
+        return table
+
+    def take(self, rows, columns=None):
+        """Legge le righe globali richieste (nell'ordine dato) toccando solo i row group (e gli shard) necessari."""
+        rows = np.asarray(rows, dtype=np.int64)
+        rgs = np.searchsorted(self.rg_offsets, rows, side='right') - 1
+        pieces, positions = [], []
+        for rg in np.unique(rgs):
+            sel = np.nonzero(rgs == rg)[0]
+            table = self.read_row_group(int(rg), columns)
+            pieces.append(table.take(pa.array(rows[sel] - self.rg_offsets[rg])))
+            positions.append(sel)
+        if not pieces:
+            return self.file_schema.empty_table() if columns is None else \
+                pa.schema([self.file_schema.field(c) for c in columns]).empty_table()
+        table = pa.concat_tables(pieces, promote_options="default")
+        return table.take(pa.array(np.argsort(np.concatenate(positions))))
+
+    def sample_columns(self, columns, rows):
+        """
+        Fino a 'rows' valori per colonna dall'inizio del primo row group. Si leggono
+        solo le prime pagine delle colonne richieste, quindi il costo non dipende
+        dalla dimensione del dataset.
+        """
+        sample = {c: [] for c in columns}
+        if not columns or self.num_row_groups == 0:
+            return sample
+        shard, rg = self.row_groups[0]
+        # Lettura a buffer senza pre_buffer: si leggono le prime pagine, non l'intera colonna di blob
+        pf = pq.ParquetFile(self.fragments[shard].path, metadata=self.shard_meta[shard],
+                            pre_buffer=False, buffer_size=1 << 20)
+        names = [c for c in columns if c in pf.schema_arrow.names]
+        if not names:
+            return sample
+        batch = next(pf.iter_batches(batch_size=rows, row_groups=[rg], columns=names), None)
+        if batch is not None:
+            for c in names:
+                sample[c] = batch.column(c).to_pylist()
+        return sample
+
+    def light_columns(self, img_col):
+        # Colonne blob da non leggere mai e, tra queste, gli struct di cui tenere il 'path'
+        def is_blob(t):
+            return (pa.types.is_binary(t) or pa.types.is_large_binary(t) or
+                    (pa.types.is_struct(t) and t.get_field_index('bytes') >= 0))
+        img_type = self.schema.field(img_col).type
+        blobs = [f.name for f in self.file_schema if is_blob(f.type) or
+                 (f.name == img_col and not is_text_type(img_type))]
+        with_path = [c for c in blobs if pa.types.is_struct(self.file_schema.field(c).type) and
+                     self.file_schema.field(c).type.get_field_index('path') >= 0]
+        return blobs, with_path
+
+    def read_light(self, i, img_col, row_group=None):
+        # Shard i (o un suo row group) senza blob, con le partizioni Hive come colonne
+        blobs, with_path = self.light_columns(img_col)
+        names = self.shard_meta[i].schema.to_arrow_schema().names
+        cols = [c for c in names if c not in blobs]
+        cols += [f"{c}.path" for c in with_path if c in names]
+        pf = self.open_shard(i)
+        table = pf.read(columns=cols) if row_group is None else pf.read_row_group(row_group, columns=cols)
+        for c in with_path:
+            idx = table.schema.get_field_index(c)
+            if idx >= 0:
+                table = table.set_column(idx, c, pc.struct_field(table.column(idx), 'path'))
+        return self.add_partitions(i, table)
+
+    def add_partitions(self, i, table, columns=None):
+        # Chiavi Hive dello shard i come colonne costanti
+        for key in self.partition_columns:
+            if columns is not None and key not in columns: continue
+            value = self.partitions[i].get(key)
+            table = table.append_column(self.schema.field(key),
+                                        pa.array([value] * table.num_rows, type=self.schema.field(key).type))
+        return table
+
+    def read_selection(self, g, local_rows, columns=None):
+        """
+        Righe (indici locali) di un row group, lette con memory map e senza passare
+        dalla cache LRU: per chi scorre un sottoinsieme una volta sola (esportazione).
+        """
+        shard, rg = self.row_groups[g]
+        pf = pq.ParquetFile(self.fragments[shard].path, metadata=self.shard_meta[shard], memory_map=True)
+        names = pf.schema_arrow.names
+        table = pf.read_row_group(rg, columns=[c for c in columns if c in names] if columns is not None else None)
+        return self.add_partitions(shard, table.take(pa.array(local_rows)), columns)
+
+    def read_head(self, img_col):
+        """Metadati del solo primo row group: bastano per mostrare subito le prime miniature."""
+        if self.num_row_groups == 0:
+            return self.read_metadata(img_col)
+        shard, rg = self.row_groups[0]
+        table = self.read_light(shard, img_col, rg)
+        return table.select([c for c in self.columns if c in table.column_names])
+
+    def read_metadata(self, img_col, progress=None):
+        """
+        Legge in blocco le colonne leggere di tutti gli shard (in parallelo). Delle
+        colonne immagine (la scelta e le altre) teniamo solo il sotto-campo 'path'
+        (formato HuggingFace), mai i bytes. Le partizioni Hive diventano colonne come le altre.
+        'progress(letti, totale)' è chiamata dopo ogni shard; se solleva un'eccezione
+        gli shard non ancora partiti vengono annullati.
+        """
+        tables = []
+        with ThreadPoolExecutor(max_workers=min(32, len(self.fragments))) as pool:
+            futures = [pool.submit(self.read_light, i, img_col) for i in range(len(self.fragments))]
+            try:
+                for future in futures:
+                    tables.append(future.result())
+                    if progress is not None:
+                        progress(len(tables), len(futures))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        # concat_tables non copia i dati: gli shard restano chunk separati
+        table = pa.concat_tables(tables, promote_options="default")
+        return table.select([c for c in self.columns if c in table.column_names])
+
+    def filter_rows(self, expression, columns, meta_table):
+        """
+        Righe globali che soddisfano 'expression'. Gli shard esclusi dalle partizioni
+        e i row group che le statistiche min/max dei footer escludono non vengono
+        né letti né valutati; gli altri si valutano sui metadati già in memoria.
+        """
+        missing = [c for c in columns if c not in meta_table.column_names]
+        if missing:
+            raise FilterError(f"Colonna non filtrabile: {', '.join(missing)}")
+        # Le statistiche valgono solo se la colonna nel file è identica a quella in memoria
+        prunable = all(self.schema.field(c).type == meta_table.schema.field(c).type for c in columns)
+        if prunable:
+            row_groups = [int(self.shard_first_rg[i]) + piece.row_groups[0].id
+                          for i, fragment in enumerate(self.fragments)
+                          for piece in fragment.split_by_row_group(filter=expression, schema=self.schema)]
+        else:
+            row_groups = range(self.num_row_groups)
+        hits = []
+        for rg in row_groups:
+            start, stop = int(self.rg_offsets[rg]), int(self.rg_offsets[rg + 1])
+            table = meta_table.slice(start, stop - start).select(list(columns))
+            table = table.append_column("__row__", pa.array(np.arange(start, stop, dtype=np.int64)))
+            hits.append(table.filter(expression).column("__row__").to_numpy())
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def read_blob(self, row, column):
+        """
+        Bytes originali della cella immagine di una riga globale. Il file è mappato in
+        memoria e si decodifica il solo row group che la contiene, della sola colonna
+        (del solo sotto-campo 'bytes' per gli struct), senza passare dalla cache LRU.
+        """
+        g = int(np.searchsorted(self.rg_offsets, row, side='right') - 1)
+        shard, rg = self.row_groups[g]
+        is_struct = pa.types.is_struct(self.file_schema.field(column).type)
+        pf = pq.ParquetFile(self.fragments[shard].path, metadata=self.shard_meta[shard], memory_map=True)
+        if column not in pf.schema_arrow.names:
+            return None
+        table = pf.read_row_group(rg, columns=[f"{column}.bytes" if is_struct else column])
+        value = table.column(0)[int(row - self.rg_offsets[g])].as_py()
+        return value.get('bytes') if isinstance(value, dict) else value
+
+    def read_cells(self, rows, column):
+        # Valori di una sola colonna per le righe globali richieste
+        return self.take(rows, [column]).column(0).to_pylist()
+
+def image_format(data):
+    # Formato PIL, "" se PIL non lo riconosce. Image.open legge solo l'intestazione, non decodifica
+    if not isinstance(data, bytes) or not data:
+        return ""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.format or ""
+    except Exception:
+        return ""
 
-# --- UTILITÀ SICURA PER IMMAGINI ---
-def pil_to_pixmap_robust(pil_image):
+def is_image_bytes(data):
+    return bool(image_format(data))
+
+def hf_feature_types(schema):
+    # Tipi delle feature dichiarate da HuggingFace datasets nei metadati dello schema (es. 'Image', 'Audio')
     try:
+        features = json.loads((schema.metadata or {}).get(b"huggingface", b"{}"))["info"]["features"]
+        return {name: f.get("_type") for name, f in features.items() if isinstance(f, dict)}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+def detect_image_columns(dataset):
+    """
+    Colonne immagine candidate come lista di (colonna, modalità 'path' o 'bytes'),
+    la prima è quella predefinita. Decide lo schema Arrow (struct {'bytes', 'path'},
+    binari, feature 'Image' HuggingFace). Gli struct dichiarati di altro tipo (es.
+    'Audio') si scartano; binari, stringhe e struct non dichiarati si verificano su
+    un campione limitato del primo row group, saltando i valori nulli.
+    """
+    schema = dataset.file_schema
+    hf = hf_feature_types(schema)
+    declared, structs, binaries, strings = [], [], [], []
+    for field in schema:
+        t = field.type
+        if pa.types.is_struct(t) and t.get_field_index('bytes') >= 0:
+            if hf.get(field.name) == "Image":
+                declared.append(field.name)
+            elif field.name not in hf:
+                structs.append(field.name)
+        elif pa.types.is_binary(t) or pa.types.is_large_binary(t):
+            binaries.append(field.name)
+        elif is_text_type(t):
+            strings.append(field.name)
+    sample = dataset.sample_columns(structs + binaries + strings, DETECT_SAMPLE_ROWS)
+    for c in structs:
+        sample[c] = [v.get('bytes') if v else None for v in sample[c]]
+
+    def looks_like_paths(values):
+        values = [v for v in values if v]
+        hits = sum(1 for v in values if v.lower().endswith(IMAGE_EXTENSIONS) and "://" not in v)
+        return bool(values) and hits * 2 >= len(values)
+
+    is_named = lambda c: "path" in c.lower() or "file" in c.lower()
+    all_null = lambda c: not any(v is not None for v in sample[c])
+    paths = [c for c in strings if looks_like_paths(sample[c])]
+    named = [c for c in paths if is_named(c)]
+    images = [c for c in structs + binaries if any(is_image_bytes(v) for v in sample[c])]
+    # Colonne tutte nulle nel campione: candidate, ma dopo quelle verificate. Tra le
+    # stringhe solo quelle col nome da percorso (es. 'image_path'), non 'notes' o 'negative_prompt'
+    unknown = [(c, 'bytes') for c in structs + binaries if all_null(c)]
+    unknown += [(c, 'path') for c in strings if all_null(c) and is_named(c)]
+    return ([(c, 'path') for c in named] + [(c, 'bytes') for c in declared + images] +
+            [(c, 'path') for c in paths if c not in named] + unknown)
+
+# --- RICERCA ---
+def is_text_type(t):
+    if pa.types.is_dictionary(t):
+        t = t.value_type
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+class SearchEngine:
+    """
+    Ricerca per sottostringa (case-insensitive) vettorizzata con pyarrow.compute,
+    solo sulle colonne di testo. Le colonne descrittive possono avere un indice
+    di trigrammi, costruito in background, che restringe i candidati da verificare.
+    """
+    INDEX_COLUMNS = ('description', 'caption', 'prompt', 'text', 'alt_text')
+    # Coppie che RE2 considera uguali ma fold() no (ΐ/ΐ, ΰ/ΰ, ﬅ/ﬆ): con questi caratteri si scansiona
+    FOLD_UNSAFE = frozenset("\u0390\u1fd3\u03b0\u1fe3\ufb05\ufb06")
+    INDEX_VERSION = 2  # Da incrementare se cambia come si calcolano i trigrammi (2: fold())
+
+    def __init__(self, table):
+        self.num_rows = table.num_rows
+        self.columns = {}
+        for field in table.schema:
+            if is_text_type(field.type):
+                col = table.column(field.name)
+                if pa.types.is_dictionary(field.type):
+                    col = col.cast(pa.string())
+                self.columns[field.name] = col
+        self.trigrams = None        # (codici ordinati, offset, righe): posting list concatenate
+        self.indexed_columns = ()
+        self.cache = OrderedDict()  # query -> righe, le più recenti in fondo
+        self.cache_bytes = 0
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def gram_codes(data):
+        # Trigrammi di byte UTF-8 come interi a 24 bit; 'data' è un array uint8
+        return (data[:-2].astype(np.int32) << 16) | (data[1:-1].astype(np.int32) << 8) | data[2:]
+
+    @staticmethod
+    def sorted_unique(keys):
+        # np.unique nelle versioni recenti passa per una hash table molto più lenta del sort
+        keys.sort()
+        return keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+
+    @staticmethod
+    def fold(arr):
+        # Forma canonica per l'indice: minuscolo del maiuscolo. Come il case folding di RE2
+        # (ignore_case in match) unifica anche σ/ς/Σ, ſ/s e il segno Kelvin, che utf8_lower lascia distinti
+        return pc.utf8_lower(pc.utf8_upper(arr))
+
+    @staticmethod
+    def block_keys(arr, first_row):
+        # Coppie (trigramma, riga) distinte di un blocco di righe, come int64: codice << 32 | riga
+        arr = SearchEngine.fold(pc.fill_null(arr, "")).cast(pa.large_string())
+        offsets = np.frombuffer(arr.buffers()[1], dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+        if arr.buffers()[2] is None or offsets[-1] == offsets[0]:
+            return np.empty(0, dtype=np.int64)
+        data = np.frombuffer(arr.buffers()[2], dtype=np.uint8)
+        counts = np.maximum(np.diff(offsets) - 2, 0)  # Trigrammi per riga
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Inizio di ogni trigramma nel buffer: offset della riga + posizione nella riga
+        starts = np.arange(total, dtype=np.int64) + np.repeat(offsets[:-1] - (np.cumsum(counts) - counts), counts)
+        codes = (data[starts].astype(np.int64) << 16) | (data[starts + 1].astype(np.int64) << 8) | data[starts + 2]
+        rows = np.repeat(np.arange(first_row, first_row + len(arr), dtype=np.int64), counts)
+        return SearchEngine.sorted_unique((codes << 32) | rows)
+
+    def build_index(self):
+        """
+        Indice trigrammi -> righe costruito con numpy a blocchi di righe, senza loop
+        Python per riga (i sort di numpy rilasciano il GIL). Le posting list stanno
+        concatenate in un unico array int32, come su disco.
+        """
+        cols = tuple(c for c in self.columns if c.lower() in self.INDEX_COLUMNS)
+        keys = []
+        for name in cols:
+            first = 0
+            for chunk in self.columns[name].chunks:
+                for start in range(0, len(chunk), INDEX_BLOCK_ROWS):
+                    keys.append(self.block_keys(chunk.slice(start, INDEX_BLOCK_ROWS), first + start))
+                first += len(chunk)
+        # Lo stesso trigramma in più colonne della stessa riga conta una volta
+        keys = self.sorted_unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+        codes = (keys >> 32).astype(np.int32)
+        postings = (keys & 0xFFFFFFFF).astype(np.int32)
+        del keys
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        grams = codes[np.concatenate([[0], bounds])] if len(codes) else codes
+        offsets = np.concatenate([[0], bounds, [len(codes)]]).astype(np.int64) if len(codes) else np.zeros(1, np.int64)
+        # Assegnazione unica: search() vede o il vecchio stato o quello completo
+        self.indexed_columns, self.trigrams = cols, (grams, offsets, postings)
+
+    def save_index(self, directory):
+        # Posting list concatenate + offset: un solo file .npz, senza pickle
+        grams, offsets, postings = self.trigrams
+        write_atomic(os.path.join(directory, "search.npz"), lambda f: np.savez(
+            f, codes=grams, offsets=offsets, postings=postings,
+            columns=np.array(self.indexed_columns, dtype=str), num_rows=self.num_rows, version=self.INDEX_VERSION))
+
+    def load_index(self, directory):
+        """Carica l'indice salvato da save_index(); False se manca o non corrisponde alla tabella."""
+        try:
+            with np.load(os.path.join(directory, "search.npz")) as data:
+                if int(data["num_rows"]) != self.num_rows or int(data["version"]) != self.INDEX_VERSION:
+                    return False
+                trigrams = (data["codes"], data["offsets"], data["postings"])
+                cols = tuple(str(c) for c in data["columns"])
+        except (OSError, ValueError, KeyError):
+            return False  # Anche gli indici dei formati precedenti: si ricostruiscono
+        if any(c not in self.columns for c in cols):
+            return False
+        self.indexed_columns, self.trigrams = cols, trigrams
+        return True
+
+    def candidates(self, folded):
+        # 'folded': bytes UTF-8 della query già passata da fold(), almeno un trigramma
+        grams, offsets, postings = self.trigrams
+        lists = []
+        for code in np.unique(self.gram_codes(np.frombuffer(folded, dtype=np.uint8))):
+            i = int(np.searchsorted(grams, code))
+            found = i < len(grams) and grams[i] == code
+            lists.append(postings[offsets[i]:offsets[i + 1]] if found else postings[:0])
+        lists.sort(key=len)
+        result = lists[0]
+        for other in lists[1:]:
+            if len(result) == 0: break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def search(self, query, rows=None):
+        """
+        Righe (indici globali, ordinati) in cui almeno una colonna di testo contiene
+        la query. Se 'rows' è dato, la verifica avviene solo su quel sottoinsieme.
+        """
+        query = query.lower()
+        trigrams, indexed = self.trigrams, self.indexed_columns
+        folded = b""
+        if trigrams is not None and self.FOLD_UNSAFE.isdisjoint(query):
+            folded = self.fold(pa.array([query]))[0].as_py().encode()
+        use_index = len(folded) >= 3 and bool(indexed)
+        if rows is None:
+            mask = np.zeros(self.num_rows, dtype=bool)
+            for name, col in self.columns.items():
+                if use_index and name in indexed: continue
+                mask |= self.match(col, query)
+            if use_index:
+                cand = self.candidates(folded)
+                for name in indexed:
+                    if len(cand) == 0: break
+                    mask[cand[self.match(self.columns[name].take(pa.array(cand)), query)]] = True
+            return np.nonzero(mask)[0]
+
+        # Raffinamento: si lavora solo sulle righe del risultato precedente
+        rows = np.asarray(rows, dtype=np.int64)
+        if use_index:
+            in_cand = np.isin(rows, self.candidates(folded), assume_unique=True)
+        mask = np.zeros(len(rows), dtype=bool)
+        idx = pa.array(rows)
+        for name, col in self.columns.items():
+            if use_index and name in indexed:
+                sub = rows[in_cand]
+                if len(sub) == 0: continue
+                mask[np.nonzero(in_cand)[0][self.match(col.take(pa.array(sub)), query)]] = True
+            else:
+                mask |= self.match(col.take(idx), query)
+        return rows[mask]
+
+    @staticmethod
+    def match(col, query):
+        return pc.fill_null(pc.match_substring(col, query, ignore_case=True), False).to_numpy(zero_copy_only=False)
+
+    def cached_search(self, query):
+        # Se una query recente è contenuta in questa, i risultati sono un sottoinsieme dei suoi
+        query = query.lower()
+        with self._cache_lock:
+            if query in self.cache:
+                self.cache.move_to_end(query)
+                return self.cache[query]
+            base = max((q for q in self.cache if q in query), key=len, default=None)
+            base_rows = self.cache[base] if base is not None else None
+        rows = self.search(query, base_rows)
+        with self._cache_lock:
+            old = self.cache.pop(query, None)
+            if old is not None:
+                self.cache_bytes -= old.nbytes
+            self.cache[query] = rows
+            self.cache_bytes += rows.nbytes
+            # Limite in byte, non in voci: un risultato può essere lungo quanto la tabella
+            while self.cache_bytes > SEARCH_CACHE_MB * 1024 * 1024 and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cache_bytes -= evicted.nbytes
+        return rows
+
+class SearchSignals(QObject):
+    result = pyqtSignal(int, object)  # generazione, righe
+
+class SearchWorker(QRunnable):
+    def __init__(self, engine, query, generation):
+        super().__init__()
+        self.engine = engine
+        self.query = query
+        self.generation = generation
+        self.signals = SearchSignals()
+
+    def run(self):
+        try:
+            with PERF.span("search.query", query=self.query):
+                rows = self.engine.cached_search(self.query)
+        except Exception as e:
+            print(f"Errore ricerca: {e}")
+            rows = np.empty(0, dtype=np.int64)
+        self.signals.result.emit(self.generation, rows)
+
+class IndexBuilderWorker(QRunnable):
+    def __init__(self, engine, directory=None, build=True):
+        super().__init__()
+        self.engine = engine
+        self.directory = directory  # Se presente, l'indice si carica da qui (o vi si salva)
+        self.build = build  # False: solo l'indice già su disco (es. da kparquet_warm)
+
+    def run(self):
+        try:
+            if self.directory is not None and self.engine.load_index(self.directory):
+                return
+            if not self.build:
+                return
+            self.engine.build_index()
+            if self.directory is not None:
+                self.engine.save_index(self.directory)
+        except Exception as e:
+            print(f"Errore indice di ricerca: {e}")
+
+# --- ORDINAMENTO ---
+def is_sortable_type(t):
+    return not (pa.types.is_nested(t) or pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_null(t))
+
+class SortIndex:
+    """
+    Ordinamenti come permutazioni di indici. Per ogni chiave (colonna, verso) si
+    calcola una volta, con pc.sort_indices sulla sola colonna chiave, il rango di
+    ogni riga: qualunque sottoinsieme (ricerca/filtro) si ordina poi confrontando
+    i ranghi. Le viste già ordinate restano in un piccolo LRU. Con 'directory'
+    le permutazioni si salvano su disco e alla riapertura non si ricalcolano.
+    """
+    def __init__(self, table, max_views=16, directory=None):
+        self.table = table
+        self.directory = directory
+        self.perms = {}   # chiave -> permutazione dell'intero dataset
+        self.ranks = {}   # chiave -> rango di ogni riga
+        self.views = OrderedDict()
+        self.max_views = max_views
+
+    def rank(self, key):
+        if key not in self.ranks:
+            perm = self.load_perm(key)
+            if perm is None:
+                column, order = key
+                # I null finiscono in fondo (comportamento predefinito di sort_indices)
+                perm = pc.sort_indices(self.table.select([column]), sort_keys=[(column, order)]).to_numpy().astype(np.int64)
+                self.save_perm(key, perm)
+            rank = np.empty(len(perm), dtype=np.int64)
+            rank[perm] = np.arange(len(perm), dtype=np.int64)
+            self.perms[key], self.ranks[key] = perm, rank
+        return self.ranks[key]
+
+    def perm_path(self, key):
+        column, order = key
+        return os.path.join(self.directory, f"sort-{hashlib.sha1(column.encode()).hexdigest()[:16]}-{order}.npy")
+
+    def load_perm(self, key):
+        if self.directory is None: return None
+        try:
+            perm = np.load(self.perm_path(key))
+        except (OSError, ValueError):
+            return None
+        return perm.astype(np.int64) if len(perm) == self.table.num_rows else None
+
+    def save_perm(self, key, perm):
+        if self.directory is None: return
+        # int32 basta fino a 2^31 righe e dimezza lo spazio su disco
+        perm = perm.astype(np.int32) if len(perm) < 2 ** 31 else perm
+        try:
+            write_atomic(self.perm_path(key), lambda f: np.save(f, perm))
+        except OSError as e:
+            print(f"Ordinamento non salvato: {e}")
+
+    def sorted_view(self, rows, key, view_key=None):
+        """Le righe 'rows' (senza duplicati) nell'ordine della chiave; None = ordine naturale."""
+        if key is None:
+            return rows
+        cache_key = (view_key, key)
+        if view_key is not None and cache_key in self.views:
+            self.views.move_to_end(cache_key)
+            return self.views[cache_key]
+        rank = self.rank(key)
+        if len(rows) == self.table.num_rows:
+            view = self.perms[key]
+        else:
+            # Stabile: a parità di chiave resta l'ordine del risultato di partenza
+            view = rows[np.argsort(rank[rows], kind="stable")]
+        if view_key is not None:
+            self.views[cache_key] = view
+            while len(self.views) > self.max_views:
+                self.views.popitem(last=False)
+        return view
+
+# --- FILTRI STRUTTURATI ---
+class FilterError(ValueError):
+    pass
+
+FILTER_TOKEN = re.compile(r"""\s*(?:
+    (?P<num>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)(?![\w.])
+  | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>==|!=|>=|<=|=|>|<|~|\(|\)|,)
+  | (?P<name>`[^`]+`|[A-Za-z_][\w.]*)
+)""", re.VERBOSE)
+
+COMPARISONS = {
+    "==": lambda f, v: f == v, "=": lambda f, v: f == v, "!=": lambda f, v: f != v,
+    ">": lambda f, v: f > v, ">=": lambda f, v: f >= v,
+    "<": lambda f, v: f < v, "<=": lambda f, v: f <= v,
+}
+
+class FilterParser:
+    """
+    Compila una condizione come  width>=1024 and aesthetic_score>6 and source=="laion"
+    in un'espressione pyarrow.dataset. Operatori: == = != > >= < <=, ~ (contiene),
+    in (a, b, ...), and / or / not, parentesi; valori: numeri, "stringhe", true/false, null.
+    """
+    def __init__(self, text, schema):
+        self.schema = schema
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.columns = set()
+
+    @staticmethod
+    def tokenize(text):
+        tokens, pos = [], 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = FILTER_TOKEN.match(text, pos)
+            if not m or m.end() == pos:
+                raise FilterError(f"Carattere inatteso alla posizione {pos + 1}: {text[pos:pos + 10]!r}")
+            kind = m.lastgroup
+            tokens.append((kind, m.group(kind)))
+            pos = m.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def next(self):
+        tok = self.peek()
+        if tok[0] is None:
+            raise FilterError("Filtro incompleto")
+        self.pos += 1
+        return tok
+
+    def keyword(self, word):
+        kind, val = self.peek()
+        if kind == "name" and val.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, op):
+        kind, val = self.next()
+        if val != op:
+            raise FilterError(f"Atteso '{op}', trovato {val!r}")
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterError("Filtro vuoto")
+        expr = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise FilterError(f"Testo inatteso: {self.peek()[1]!r}")
+        return expr
+
+    def parse_or(self):
+        expr = self.parse_and()
+        while self.keyword("or"):
+            expr = expr | self.parse_and()
+        return expr
+
+    def parse_and(self):
+        expr = self.parse_not()
+        while self.keyword("and"):
+            expr = expr & self.parse_not()
+        return expr
+
+    def parse_not(self):
+        if self.keyword("not"):
+            return ~self.parse_not()
+        if self.peek() == ("op", "("):
+            self.next()
+            expr = self.parse_or()
+            self.expect(")")
+            return expr
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, name = self.next()
+        if kind != "name":
+            raise FilterError(f"Atteso un nome di colonna, trovato {name!r}")
+        name = name.strip("`")
+        if name not in self.schema.names:
+            raise FilterError(f"Colonna sconosciuta: {name}")
+        self.columns.add(name)
+        field, ftype = ds.field(name), self.schema.field(name).type
+        if self.keyword("in"):
+            self.expect("(")
+            values = [self.parse_value(name, ftype)]
+            while self.peek() == ("op", ","):
+                self.next()
+                values.append(self.parse_value(name, ftype))
+            self.expect(")")
+            return field.isin(values)
+        kind, op = self.next()
+        if op == "~":
+            if not is_text_type(ftype):
+                raise FilterError(f"'~' vale solo per colonne di testo ({name})")
+            return pc.match_substring(field, str(self.parse_value(name, ftype)), ignore_case=True)
+        if op not in COMPARISONS:
+            raise FilterError(f"Operatore non valido dopo {name}: {op!r}")
+        value = self.parse_value(name, ftype)
+        if value is None:
+            if op in ("==", "="): return field.is_null()
+            if op == "!=": return ~field.is_null()
+            raise FilterError("null si confronta solo con == o !=")
+        return COMPARISONS[op](field, value)
+
+    def parse_value(self, name, ftype):
+        kind, val = self.next()
+        if kind == "str":
+            value = re.sub(r"\\(.)", r"\1", val[1:-1])
+        elif kind == "num":
+            # Per le colonne di testo il numero resta com'è scritto (es. id == 00123)
+            value = val if is_text_type(ftype) else (float(val) if re.search(r"[.eE]", val) else int(val))
+        elif kind == "name" and val.lower() in ("true", "false"):
+            return val.lower() == "true"
+        elif kind == "name" and val.lower() == "null":
+            return None
+        else:
+            raise FilterError(f"Valore atteso per {name}, trovato {val!r}")
+        if isinstance(value, str) and not is_text_type(ftype):
+            # Date e timestamp scritti come stringa vengono convertiti al tipo della colonna
+            try:
+                return pa.scalar(value).cast(ftype)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise FilterError(f"Valore {value!r} non valido per {name} ({ftype})")
+        return value
+
+def compile_filter(text, schema):
+    """Restituisce (espressione, colonne usate)."""
+    parser = FilterParser(text, schema)
+    return parser.parse(), parser.columns
+
+# --- CACHE MINIATURE SU DISCO ---
+def cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "kparquet")
+
+def index_dir(fingerprint):
+    # Indici di ricerca e ordinamento, uno per impronta del dataset
+    return os.path.join(cache_dir(), "indices", fingerprint)
+
+def touch_index_dir(directory):
+    # Ultimo uso degli indici di un dataset, per prune_indices()
+    try:
+        os.utime(directory)
+    except OSError:
+        pass
+
+def prune_indices(max_mb=INDEX_CACHE_MB, keep=None):
+    """
+    Oltre 'max_mb' cancella gli indici dei dataset usati meno di recente (mtime
+    della cartella), tranne quelli in 'keep'. Restituisce i byte liberati.
+    """
+    root = os.path.join(cache_dir(), "indices")
+    entries = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False): continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+    total, freed = sum(size for _, size, _ in entries), 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_mb * 1024 * 1024: break
+        if path == keep: continue
+        shutil.rmtree(path, ignore_errors=True)
+        freed += size
+    return freed
+
+def write_atomic(path, save):
+    # File temporaneo + rename: chi legge vede il file precedente o quello completo, mai a metà
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            save(f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def encode_thumbnail(pil_image):
+    with PERF.span("thumb.encode"):
         if pil_image.mode != "RGB":
             pil_image = pil_image.convert("RGB")
-        byte_arr = io.BytesIO()
-        pil_image.save(byte_arr, format='PNG')
-        qpix = QPixmap()
-        qpix.loadFromData(byte_arr.getvalue())
-        return qpix
+        buf = io.BytesIO()
+        pil_image.save(buf, format=THUMB_FORMAT, quality=85)
+        return buf.getvalue()
+
+class ThumbnailCache:
+    """
+    Miniature già codificate (WebP/JPEG) in un database SQLite sotto la cache XDG,
+    indicizzate per impronta del file + riga. Oltre il limite in MB vengono
+    eliminate quelle usate meno di recente.
+    """
+    def __init__(self, db_path=None, max_mb=THUMB_CACHE_MB):
+        if db_path is None:
+            os.makedirs(cache_dir(), exist_ok=True)
+            db_path = os.path.join(cache_dir(), "thumbnails.sqlite")
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [c[1] for c in self.conn.execute("PRAGMA table_info(thumbs)")]
+        if columns and columns[-1] != "data":
+            # Vecchio schema col blob prima di size/atime: ogni scansione attraversava tutte le
+            # pagine di overflow. È solo una cache, si riparte da vuota
+            self.conn.execute("DROP TABLE thumbs")
+        # Il blob per ultimo, e size nell'indice su atime: totale e sfratto leggono solo l'indice
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS thumbs (
+            fp TEXT NOT NULL, row INTEGER NOT NULL, size INTEGER NOT NULL,
+            atime REAL NOT NULL, data BLOB NOT NULL, PRIMARY KEY (fp, row))""")
+        self.conn.execute("DROP INDEX IF EXISTS thumbs_atime")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS thumbs_atime_size ON thumbs (atime, size)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumbs").fetchone()[0]
+
+    def get_many(self, fp, rows):
+        rows = [int(r) for r in rows]
+        if not rows: return {}
+        marks = ",".join("?" * len(rows))
+        with self._lock:
+            found = self.conn.execute(
+                f"SELECT row, data FROM thumbs WHERE fp = ? AND row IN ({marks})", [fp, *rows]).fetchall()
+            if found:
+                self.conn.execute(
+                    f"UPDATE thumbs SET atime = ? WHERE fp = ? AND row IN ({','.join('?' * len(found))})",
+                    [time.time(), fp, *[r for r, _ in found]])
+        return dict(found)
+
+    def put(self, fp, row, data):
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM thumbs WHERE fp = ? AND row = ?", (fp, int(row))).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?, ?)",
+                              (fp, int(row), len(data), time.time(), data))
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def put_many(self, fp, items):
+        # Una sola transazione per molte miniature (riscaldamento in blocco)
+        items = [(int(row), data) for row, data in items]
+        if not items: return
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for row, data in items:
+                    old = self.conn.execute("SELECT size FROM thumbs WHERE fp = ? AND row = ?", (fp, row)).fetchone()
+                    self.conn.execute("INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?, ?)",
+                                      (fp, row, len(data), now, data))
+                    self.total_bytes += len(data) - (old[0] if old else 0)
+                self.conn.execute("COMMIT")
+            except sqlite3.Error:
+                self.conn.execute("ROLLBACK")
+                raise
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def present(self, fp, start, stop):
+        """Righe in [start, stop) che hanno già una miniatura (senza leggerne i dati)."""
+        with self._lock:
+            found = self.conn.execute("SELECT row FROM thumbs WHERE fp = ? AND row >= ? AND row < ?",
+                                      (fp, int(start), int(stop))).fetchall()
+        return {r for r, in found}
+
+    def _evict(self):
+        # Scendiamo al 90% del limite togliendo le miniature meno usate
+        target = self.total_bytes - int(self.max_bytes * 0.9)
+        freed, cutoff = 0, None
+        for size, atime in self.conn.execute("SELECT size, atime FROM thumbs ORDER BY atime"):
+            freed += size
+            cutoff = atime
+            if freed >= target: break
+        if cutoff is not None:
+            # Con atime a pari merito si cancella anche oltre 'target': si sottrae quanto cancellato davvero
+            freed = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumbs WHERE atime <= ?",
+                                      (cutoff,)).fetchone()[0]
+            self.conn.execute("DELETE FROM thumbs WHERE atime <= ?", (cutoff,))
+            self.total_bytes -= freed
+
+# --- CACHE MINIATURE IN MEMORIA ---
+class PixmapCache:
+    """LRU in memoria delle miniature già decodificate, con budget in MB (solo thread GUI)."""
+    def __init__(self, max_mb=PIXMAP_CACHE_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._items = OrderedDict()
+        self.total_bytes = 0
+
+    @staticmethod
+    def cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key):
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.total_bytes -= self.cost(old)
+        self._items[key] = pixmap
+        self.total_bytes += self.cost(pixmap)
+        while self.total_bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.total_bytes -= self.cost(evicted)
+
+    def __contains__(self, key):
+        return key in self._items
+
+# --- UTILITÀ SICURA PER IMMAGINI ---
+def pil_to_qimage(pil_image):
+    """
+    QImage costruito direttamente dal buffer raw RGB/RGBA, senza passare da PNG.
+    Lo stride (bytesPerLine) è esplicito, così le larghezze non multiple di 4 non
+    producono immagini "storte". Sicuro da usare nei thread worker.
+    """
+    try:
+        with PERF.span("thumb.convert"):
+            if pil_image.mode not in ("RGB", "RGBA"):
+                has_alpha = "A" in pil_image.getbands() or "transparency" in pil_image.info
+                pil_image = pil_image.convert("RGBA" if has_alpha else "RGB")
+            if pil_image.mode == "RGBA":
+                fmt, channels = QImage.Format.Format_RGBA8888, 4
+            else:
+                fmt, channels = QImage.Format.Format_RGB888, 3
+            data = pil_image.tobytes()
+            qimg = QImage(data, pil_image.width, pil_image.height, pil_image.width * channels, fmt)
+            # copy(): il QImage deve possedere i dati, 'data' viene liberato all'uscita
+            return qimg.copy()
     except Exception as e:
         print(f"Errore conversione: {e}")
         return None
 
 # --- WIDGET DRAGGABLE (Nuova Feature) ---
+_drag_dir = None
+
+def drag_temp_dir():
+    # Una cartella per processo per i file trascinati, rimossa all'uscita dell'applicazione
+    global _drag_dir
+    if _drag_dir is None:
+        _drag_dir = tempfile.mkdtemp(prefix="kparquet-drag-")
+        atexit.register(shutil.rmtree, _drag_dir, True)
+    return _drag_dir
+
 class DraggableImageLabel(QLabel):
     """
     Una Label che permette di trascinare l'immagine fuori dall'applicazione.
-    Gestisce sia file reali che immagini binarie (creando file temp).
+    Gestisce sia file reali che immagini binarie: per queste i bytes originali
+    finiscono, così come sono, in un file temporaneo con nome univoco.
     """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image_path = None # Se esiste un path reale
         self.temp_file = None  # Se dobbiamo creare un temp
+        self.original = None   # Bytes originali dell'immagine (solo blob nel parquet)
+        self.image_format = ""
+        self.name = None       # Nome suggerito per il file esportato
         self.setAcceptDrops(False)
         self.drag_start_pos = QPoint()
         # --- IMPOSTAZIONE ICONA (Nativa KDE) ---
@@ -57,6 +1220,23 @@ class DraggableImageLabel(QLabel):
         self.setPixmap(pixmap)
         self.image_path = path
 
+    def set_original(self, data, image_format, name=None):
+        self.original = data
+        self.image_format = image_format
+        self.name = name
+
+    def export_temp_file(self):
+        # Un file per immagine, creato al primo drag: i bytes non vengono né decodificati né ricodificati
+        if self.temp_file and os.path.exists(self.temp_file):
+            return self.temp_file
+        ext = IMAGE_FORMATS.get(self.image_format, (".bin", None))[0]
+        stem = os.path.splitext(os.path.basename(self.name))[0] if isinstance(self.name, str) and self.name else ""
+        fd, path = tempfile.mkstemp(prefix=f"{stem or 'kparquet'}-", suffix=ext, dir=drag_temp_dir())
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.original)
+        self.temp_file = path
+        return path
+
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             self.drag_start_pos = event.pos()
@@ -74,6 +1254,8 @@ class DraggableImageLabel(QLabel):
         self.start_drag()
 
     def start_drag(self):
+        if self.pixmap() is None or self.pixmap().isNull():
+            return  # Immagine ancora in caricamento
         drag = QDrag(self)
         mime_data = QMimeData()
         
@@ -84,24 +1266,26 @@ class DraggableImageLabel(QLabel):
             urls.append(QUrl.fromLocalFile(os.path.abspath(self.image_path)))
         
         # CASO 2: È un blob binario nel parquet (nessun file)
-        else:
-            # Creiamo un file temporaneo per permettere il drop sul Desktop/File Manager
+        elif self.original is not None:
+            # File temporaneo per permettere il drop sul Desktop/File Manager.
+            # Resta finché l'applicazione è aperta (il destinatario può leggerlo
+            # anche dopo il drop), poi si cancella con la cartella di drag_temp_dir()
             try:
-                # Crea un file temporaneo che non viene cancellato subito
-                # Nota: In Linux /tmp viene pulito al riavvio solitamente
-                temp_dir = tempfile.gettempdir()
-                temp_name = os.path.join(temp_dir, "dragged_image.png")
-                self.pixmap().save(temp_name, "PNG")
-                urls.append(QUrl.fromLocalFile(temp_name))
-            except Exception as e:
+                urls.append(QUrl.fromLocalFile(self.export_temp_file()))
+            except OSError as e:
                 print(f"Errore creazione temp file: {e}")
 
         # Imposta gli URL (per File Managers)
         if urls:
             mime_data.setUrls(urls)
         
-        # Imposta anche l'immagine raw (per Image Editors come GIMP/Krita che supportano incolla diretto)
-        mime_data.setImageData(self.pixmap().toImage())
+        # Anche i bytes originali col loro tipo MIME (per Image Editors come GIMP/Krita che supportano incolla diretto)
+        mime_type = IMAGE_FORMATS.get(self.image_format, (None, None))[1]
+        if self.original is not None and mime_type:
+            mime_data.setData(mime_type, self.original)
+        else:
+            # File su disco o formato senza tipo MIME noto: l'immagine mostrata, come prima
+            mime_data.setImageData(self.pixmap().toImage())
 
         drag.setMimeData(mime_data)
         
@@ -113,82 +1297,681 @@ class DraggableImageLabel(QLabel):
         # Esegui il drag (CopyAction perché non vogliamo cancellare l'originale)
         drag.exec(Qt.DropAction.CopyAction)
 
+# --- DECODIFICA MINIATURE ---
+def decode_thumbnail(raw_val, mode):
+    """Apre e riduce l'immagine di una cella. FileNotFoundError se il path non esiste, None se non è un'immagine."""
+    if mode == 'path':
+        if not (isinstance(raw_val, str) and os.path.exists(raw_val)):
+            raise FileNotFoundError(raw_val)
+        with PERF.span("thumb.open"):
+            image = Image.open(raw_val)
+    else:
+        b = raw_val['bytes'] if isinstance(raw_val, dict) and 'bytes' in raw_val else raw_val
+        if not isinstance(b, bytes):
+            return None
+        with PERF.span("thumb.open"):
+            image = Image.open(io.BytesIO(b))
+    return reduce_image(image, THUMB_SIZE)
+
+def embedded_thumbnail(image, size):
+    # Miniatura JPEG negli EXIF (IFD1): la usiamo solo se è grande abbastanza e con le stesse proporzioni
+    raw = image.info.get("exif")
+    if not raw or image.format not in ("JPEG", "MPO"):
+        return None
+    try:
+        ifd1 = image.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset, length = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not offset or not length:
+            return None
+        base = 6 if raw.startswith(b"Exif\x00\x00") else 0
+        thumb = Image.open(io.BytesIO(raw[base + offset:base + offset + length]))
+        if max(thumb.size) < min(size, max(image.size)):
+            return None
+        if abs(thumb.width / thumb.height - image.width / image.height) > 0.02:
+            return None
+        thumb.load()
+        return thumb
+    except Exception:
+        return None
+
+def reduce_image(image, size):
+    """
+    Riduce l'immagine a size x size decodificando il meno possibile:
+    miniatura EXIF se adatta, altrimenti scala DCT di libjpeg (draft) per i JPEG,
+    e per gli altri formati reduce() intero + filtro bilineare.
+    """
+    thumb = embedded_thumbnail(image, size)
+    if thumb is not None:
+        image = thumb
+    elif image.format == "JPEG":
+        # Deve avvenire prima di load(): libjpeg decodifica direttamente a 1/2, 1/4 o 1/8
+        image.draft("RGB", (size, size))
+    # load() esplicito solo per misurare a parte decodifica e ridimensionamento
+    with PERF.span("thumb.decode"):
+        image.load()
+    with PERF.span("thumb.resize"):
+        image.thumbnail((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return image
+
+def thumbnail_job(raw_val, mode):
+    # Gira nei processi figli: restituisce (miniatura codificata, None) oppure (None, testo errore)
+    try:
+        image = decode_thumbnail(raw_val, mode)
+    except FileNotFoundError:
+        return None, "File mancante"
+    except Exception:
+        return None, "Errore Dati"
+    if image is None:
+        return None, "Errore Dati"
+    return encode_thumbnail(image), None
+
+# --- ESPORTAZIONE ---
+EXPORT_FORMATS = {"dir": "Cartella di file originali", "parquet": "Parquet", "webdataset": "WebDataset (tar)"}
+EXPORT_POSITION_COLUMN = "__view_position__"  # Posizione nella vista, prima colonna dei Parquet esportati
+
+def conform_table(table, schema):
+    # Stesse colonne, stesso ordine e stessi tipi dello schema del dataset (gli shard possono differire)
+    columns = [table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+               for f in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def read_file(path):
+    if not (isinstance(path, str) and os.path.isfile(path)):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+def export_name(position, width, hint, data):
+    # Posizione nella vista + nome originale; estensione dal formato reale dei bytes, se noto
+    stem, ext = os.path.splitext(os.path.basename(hint)) if isinstance(hint, str) else ("", "")
+    fmt = image_format(data)
+    if fmt:
+        ext = IMAGE_FORMATS[fmt][0]
+    return f"{position:0{width}d}{'_' + stem if stem else ''}{ext or '.bin'}"
+
+def export_rows(dataset, meta_table, rows, img_col, mode, fmt, target, workers=EXPORT_WORKERS,
+                progress=None, cancelled=None):
+    """
+    Esporta le righe globali 'rows' (nell'ordine della vista) in 'target':
+    - 'dir': file originali (i bytes così come sono nel parquet, o copie dei file su
+      disco) più metadata.jsonl con 'file_name', come le image folder HuggingFace;
+    - 'parquet': un nuovo file con tutte le colonne, blob compresi, e in testa
+      EXPORT_POSITION_COLUMN con la posizione nella vista;
+    - 'webdataset': uno shard tar con immagine e metadati (.json) per ogni riga.
+
+    Le righe si leggono in ordine di file, a blocchi (un row group, o EXPORT_CHUNK_ROWS
+    righe se le immagini sono file su disco), con al più 'workers' blocchi in lettura
+    e, per le cartelle, 'workers' file in scrittura: ogni row group si legge una volta
+    sola e in memoria non c'è mai l'intero sottoinsieme. Nomi, chiavi WebDataset e
+    la colonna di posizione del Parquet danno l'ordine della vista. La cartella di
+    destinazione deve essere vuota (FileExistsError altrimenti).
+    'progress(stats)' dopo ogni blocco; se 'cancelled()' diventa vero ci si ferma
+    (parquet e tar incompleti vengono rimossi). Restituisce le statistiche.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    width = max(6, len(str(max(len(rows) - 1, 0))))
+    stats = {"total": len(rows), "done": 0, "bytes": 0, "errors": Counter(), "start": time.time(),
+             "cancelled": False}
+
+    # Blocchi di lavoro: (row group o None, righe globali, posizioni nella vista)
+    if mode == 'bytes' or fmt == 'parquet':
+        groups = np.searchsorted(dataset.rg_offsets, sorted_rows, side='right') - 1
+        splits = np.split(np.arange(len(rows)), np.flatnonzero(np.diff(groups)) + 1)
+        blocks = [(int(groups[idx[0]]), sorted_rows[idx], order[idx]) for idx in splits if len(idx)]
+    else:
+        blocks = [(None, sorted_rows[k:k + EXPORT_CHUNK_ROWS], order[k:k + EXPORT_CHUNK_ROWS])
+                  for k in range(0, len(rows), EXPORT_CHUNK_ROWS)]
+
+    def read_block(block):
+        g, block_rows, positions = block
+        if fmt == 'parquet':
+            # Nel blocco le righe seguono l'ordine della vista
+            table = conform_table(dataset.read_selection(g, block_rows - dataset.rg_offsets[g]), dataset.schema)
+            perm = np.argsort(positions, kind="stable")
+            return table.take(pa.array(perm)).add_column(0, EXPORT_POSITION_COLUMN, pa.array(positions[perm]))
+        records = meta_table.take(pa.array(block_rows)).to_pylist()
+        if mode == 'bytes':
+            column = dataset.read_selection(g, block_rows - dataset.rg_offsets[g], [img_col]).column(img_col)
+            if pa.types.is_struct(column.type):
+                column = pc.struct_field(column, 'bytes')
+            return list(zip(records, column.to_pylist()))
+        if fmt == 'webdataset':
+            return [(r, read_file(r.get(img_col))) for r in records]
+        return [(r, None) for r in records]  # Le copie le fa il pool di scrittura
+
+    def write_file(path, data=None, source=None):
+        if source is not None:
+            shutil.copyfile(source, path)
+            return os.path.getsize(path)
+        with open(path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+    if fmt == 'dir' and os.path.isdir(target) and os.listdir(target):
+        # metadata.jsonl e i nomi per posizione sovrascriverebbero un'esportazione precedente
+        raise FileExistsError(f"La cartella {target} non è vuota")
+    is_cancelled = cancelled or (lambda: False)
+    part = target + ".part"
+    readers = ThreadPoolExecutor(max_workers=workers)
+    file_pool = ThreadPoolExecutor(max_workers=workers) if fmt == 'dir' else None
+    reading, writing = deque(), deque()
+    writer = tar = meta_file = None
+    ok = False
+    try:
+        if fmt == 'parquet':
+            writer = pq.ParquetWriter(part, dataset.schema.insert(0, pa.field(EXPORT_POSITION_COLUMN, pa.int64())))
+        elif fmt == 'webdataset':
+            tar = tarfile.open(part, "w")
+        else:
+            os.makedirs(target, exist_ok=True)
+            meta_file = open(os.path.join(target, "metadata.jsonl"), "w", encoding="utf-8")
+
+        pending = iter(blocks)
+        for block in pending:
+            reading.append((block, readers.submit(read_block, block)))
+            if len(reading) >= workers: break
+        while reading and not is_cancelled():
+            (g, block_rows, positions), future = reading.popleft()
+            result = future.result()
+            block = next(pending, None)
+            if block is not None:
+                reading.append((block, readers.submit(read_block, block)))
+
+            if fmt == 'parquet':
+                writer.write_table(result)
+                stats["bytes"] += result.nbytes
+            else:
+                for position, (record, data) in zip(positions, result):
+                    if is_cancelled(): break
+                    hint = record.get(img_col)
+                    if mode == 'path' and fmt == 'dir':
+                        if not (isinstance(hint, str) and os.path.isfile(hint)):
+                            stats["errors"]["File mancante"] += 1
+                            continue
+                    elif not isinstance(data, bytes):
+                        stats["errors"]["File mancante" if mode == 'path' else "Immagine assente"] += 1
+                        continue
+                    name = export_name(int(position), width, hint, data)
+                    if fmt == 'dir':
+                        source = hint if mode == 'path' else None
+                        writing.append(file_pool.submit(write_file, os.path.join(target, name), data, source))
+                        meta_file.write(json.dumps({"file_name": name, **record}, default=str, ensure_ascii=False) + "\n")
+                        while len(writing) >= workers * 4:
+                            stats["bytes"] += writing.popleft().result()
+                    else:
+                        key, ext = f"{int(position):0{width}d}", os.path.splitext(name)[1]
+                        meta = json.dumps(record, default=str, ensure_ascii=False).encode()
+                        for member, payload in ((key + ext, data), (key + ".json", meta)):
+                            info = tarfile.TarInfo(member)
+                            info.size, info.mtime = len(payload), int(stats["start"])
+                            tar.addfile(info, io.BytesIO(payload))
+                        stats["bytes"] += len(data)
+            stats["done"] += len(block_rows)
+            if progress is not None:
+                progress(stats)
+        while writing:
+            stats["bytes"] += writing.popleft().result()
+        stats["cancelled"] = is_cancelled()
+        ok = not stats["cancelled"]
+    finally:
+        for _, future in reading:
+            future.cancel()
+        readers.shutdown(wait=True, cancel_futures=True)
+        if file_pool is not None:
+            file_pool.shutdown(wait=True, cancel_futures=True)
+        for handle in (writer, tar, meta_file):
+            if handle is not None:
+                handle.close()
+        if fmt != 'dir':
+            if ok:
+                os.replace(part, target)
+            elif os.path.exists(part):
+                os.remove(part)
+    stats["elapsed"] = time.time() - stats["start"]
+    return stats
+
 # --- WORKER ---
 class WorkerSignals(QObject):
-    result = pyqtSignal(int, object, object)
-    finished = pyqtSignal()
+    result = pyqtSignal(int, int, object, object)  # generazione, posizione, QImage, riga
+    finished = pyqtSignal(object)  # il worker stesso
 
 class ImageLoaderWorker(QRunnable):
-    def __init__(self, df_slice, start_index, img_col_name, mode='bytes'):
+    def __init__(self, dataset, df_slice, positions, img_col_name, mode='bytes',
+                 thumb_cache=None, fingerprint=None, process_pool=None, generation=0, page=0):
         super().__init__()
+        self.dataset = dataset
         self.df_slice = df_slice
-        self.start_index = start_index
+        self.positions = list(positions)  # Indice nella vista per ogni riga di df_slice
         self.img_col_name = img_col_name
         self.mode = mode
+        self.thumb_cache = thumb_cache
+        self.fingerprint = fingerprint
+        self.process_pool = process_pool  # Se presente, la decodifica avviene fuori dal GIL
+        self.generation = generation      # Richiesta di pagina a cui appartiene il worker
+        self.page = page
         self.signals = WorkerSignals()
+        self.pending_store = []  # (riga, miniatura PIL) da codificare nella cache a fine blocco
         self.is_interrupted = False
+        # Il worker resta di proprietà di Python finché non segnala la fine:
+        # così tryTake() non tocca mai un oggetto già distrutto dal pool
+        self.setAutoDelete(False)
 
     def run(self):
-        local_idx = 0
-        for i, row in self.df_slice.iterrows():
+        # Prima la cache su disco: per le righe già viste non serve leggere né decodificare
+        cached = {}
+        if self.thumb_cache is not None:
+            try:
+                with PERF.span("thumb.disk_lookup", rows=len(self.df_slice)):
+                    cached = self.thumb_cache.get_many(self.fingerprint, self.df_slice.index)
+            except sqlite3.Error as e:
+                print(f"Errore cache miniature: {e}")
+        missing = [r for r in self.df_slice.index if r not in cached]
+        if self.thumb_cache is not None:
+            PERF.hit("thumb.disk_cache", len(cached), len(missing))
+        if self.is_interrupted:
+            self.signals.finished.emit(self)
+            return
+
+        # I metadati arrivano già in df_slice: dal file leggiamo solo la colonna immagine
+        values = {}
+        if missing and self.mode == 'bytes':
+            try:
+                with PERF.span("thumb.read", rows=len(missing)):
+                    values = dict(zip(missing, self.dataset.read_cells(missing, self.img_col_name)))
+            except Exception as e:
+                print(f"Errore lettura immagini: {e}")
+        elif missing:
+            values = self.df_slice.loc[missing, self.img_col_name].to_dict()
+
+        # Backend a processi: tutte le decodifiche partono subito, raccogliamo in ordine
+        futures = {}
+        if self.process_pool is not None and not self.is_interrupted:
+            futures = {i: self.process_pool.submit(thumbnail_job, values.get(i), self.mode) for i in missing}
+
+        unreadable = []  # Miniature in cache che Qt non sa decodificare: si rifanno dall'originale
+        for pos, (i, row) in zip(self.positions, self.df_slice.iterrows()):
+            if self.is_interrupted: break
+            # I worker producono QImage (thread-safe); i QPixmap nascono nel thread GUI
+            if i in cached:
+                with PERF.span("thumb.load_cached"):
+                    qimg = QImage.fromData(cached[i])
+                if qimg.isNull():
+                    unreadable.append((pos, i, row))
+                    continue
+            elif i in futures:
+                qimg = self.load_encoded(i, futures[i])
+            else:
+                qimg = self.load_image(i, values.get(i))
+            if qimg is not None and not qimg.isNull():
+                self.signals.result.emit(self.generation, pos, qimg, row)
+        for f in futures.values():
+            f.cancel()
+        if unreadable and not self.is_interrupted:
+            self.reload_unreadable(unreadable)
+        # La codifica per la cache su disco viene dopo la consegna: non ritarda le miniature visibili
+        for row_id, image in self.pending_store:
+            self.store_thumbnail(row_id, encode_thumbnail(image))
+        self.signals.finished.emit(self)
+
+    def reload_unreadable(self, items):
+        # Come per le miniature mancanti; la nuova codifica sostituisce quella illeggibile nella cache
+        rows = [i for _, i, _ in items]
+        if self.mode == 'bytes':
+            try:
+                values = dict(zip(rows, self.dataset.read_cells(rows, self.img_col_name)))
+            except Exception as e:
+                print(f"Errore lettura immagini: {e}")
+                return
+        else:
+            values = self.df_slice.loc[rows, self.img_col_name].to_dict()
+        for pos, i, row in items:
             if self.is_interrupted: break
-            pixmap = self.load_image(row)
-            if pixmap:
-                self.signals.result.emit(self.start_index + local_idx, pixmap, row)
-            local_idx += 1
-        self.signals.finished.emit()
+            qimg = self.load_image(i, values.get(i))
+            if qimg is not None and not qimg.isNull():
+                self.signals.result.emit(self.generation, pos, qimg, row)
 
-    def load_image(self, row):
+    def store_thumbnail(self, row_id, data):
+        if self.thumb_cache is None: return
         try:
-            image = None
-            raw_val = row[self.img_col_name]
-
-            if self.mode == 'path':
-                if isinstance(raw_val, str) and os.path.exists(raw_val):
-                    image = Image.open(raw_val)
-                else:
-                    return self.create_placeholder("File mancante")
-            
-            elif self.mode == 'bytes':
-                b = raw_val['bytes'] if isinstance(raw_val, dict) and 'bytes' in raw_val else raw_val
-                if isinstance(b, bytes):
-                    image = Image.open(io.BytesIO(b))
-            
+            with PERF.span("thumb.store"):
+                self.thumb_cache.put(self.fingerprint, row_id, data)
+        except sqlite3.Error as e:
+            print(f"Errore cache miniature: {e}")
+
+    def load_image(self, row_id, raw_val):
+        try:
+            image = decode_thumbnail(raw_val, self.mode)
             if image:
-                image.thumbnail((280, 280)) 
-                return pil_to_pixmap_robust(image)
+                if self.thumb_cache is not None:
+                    self.pending_store.append((row_id, image))
+                return pil_to_qimage(image)
+        except FileNotFoundError:
+            return self.create_placeholder("File mancante")
         except Exception:
             pass
         return self.create_placeholder("Errore Dati")
 
+    def load_encoded(self, row_id, future):
+        # Nei processi figli la strumentazione non c'è: si misura l'attesa del risultato
+        try:
+            with PERF.span("thumb.process_wait"):
+                data, error = future.result()
+        except Exception:
+            data, error = None, "Errore Dati"
+        if data is None:
+            return self.create_placeholder(error)
+        self.store_thumbnail(row_id, data)
+        return QImage.fromData(data)
+
     def create_placeholder(self, text):
-        pix = QPixmap(260, 260)
-        pix.fill(QColor(60, 60, 60))
-        painter = QPainter(pix)
+        img = QImage(260, 260, QImage.Format.Format_RGB32)
+        img.fill(QColor(60, 60, 60))
+        painter = QPainter(img)
         painter.setPen(QColor(200, 200, 200))
-        painter.drawText(pix.rect(), Qt.AlignmentFlag.AlignCenter, text)
+        painter.drawText(img.rect(), Qt.AlignmentFlag.AlignCenter, text)
         painter.end()
-        return pix
+        return img
+
+class OpenCancelled(Exception):
+    pass
+
+class OpenSignals(QObject):
+    opened = pyqtSignal(int, object)    # generazione, OpenResult con i metadati del primo row group
+    loaded = pyqtSignal(int, object)    # generazione, OpenResult con tutti i metadati
+    progress = pyqtSignal(int, str)     # generazione, messaggio per la barra di stato
+    failed = pyqtSignal(int, str)       # generazione, errore
+    finished = pyqtSignal(object)       # il worker stesso
+
+class OpenResult:
+    __slots__ = ("dataset", "candidates", "img_col", "mode", "fingerprint", "meta_table", "df")
+
+class OpenWorker(QRunnable):
+    """
+    Apertura di un dataset fuori dal thread GUI, in due consegne: prima footer,
+    colonna immagine e metadati del primo row group (la griglia parte subito),
+    poi i metadati completi per ricerca, filtri e ordinamento.
+    """
+    def __init__(self, source, img_col=None, generation=0):
+        super().__init__()
+        self.source = source
+        self.img_col = img_col
+        self.generation = generation
+        self.label = source if isinstance(source, str) else f"{len(source)} file"
+        self.signals = OpenSignals()
+        self.is_interrupted = False  # Un'altra apertura ha preso il suo posto
+        self.setAutoDelete(False)
+
+    def check(self):
+        if self.is_interrupted:
+            raise OpenCancelled()
+
+    def run(self):
+        try:
+            result = OpenResult()
+            # Solo footer: nessuna riga viene letta qui
+            with PERF.span("open.footers", source=self.label):
+                result.dataset = dataset = ParquetDataset(self.source)
+            self.check()
+            with PERF.span("open.detect"):
+                result.candidates = detect_image_columns(dataset)
+            if not result.candidates:
+                raise ValueError("Nessuna colonna immagine trovata.")
+            result.img_col, result.mode = next((c for c in result.candidates if c[0] == self.img_col),
+                                               result.candidates[0])
+            result.fingerprint = dataset.fingerprint(result.img_col)
+            with PERF.span("open.head"):
+                result.meta_table = dataset.read_head(result.img_col)
+                result.df = result.meta_table.to_pandas()
+            self.check()
+            self.signals.opened.emit(self.generation, result)
+
+            def progress(done, total):
+                self.check()
+                if total > 1:
+                    self.signals.progress.emit(self.generation, f"{self.label}: metadati {done}/{total} file...")
+
+            full = OpenResult()
+            full.dataset, full.img_col = dataset, result.img_col
+            with PERF.span("open.metadata", rows=dataset.num_rows):
+                full.meta_table = dataset.read_metadata(result.img_col, progress)
+            self.check()
+            with PERF.span("open.to_pandas"):
+                full.df = full.meta_table.to_pandas()
+            self.check()
+            self.signals.loaded.emit(self.generation, full)
+        except OpenCancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        finally:
+            self.signals.finished.emit(self)
+
+class DetailSignals(QObject):
+    original = pyqtSignal(object, str)  # bytes originali (None per i file su disco), formato PIL
+    image = pyqtSignal(object, bool)    # QImage, True se è la versione definitiva
+    failed = pyqtSignal(str)
+
+class DetailLoaderWorker(QRunnable):
+    """
+    Immagine della finestra di dettaglio, fuori dal thread GUI. I bytes originali
+    si leggono solo ora (ParquetDataset.read_blob); per i JPEG grandi arriva prima
+    un'anteprima decodificata a bassa scala, poi la versione alla dimensione di
+    visualizzazione, sempre con draft() di libjpeg: mai l'immagine intera in RAM.
+    """
+    def __init__(self, dataset, row_id, img_col, mode, path=None, size=DETAIL_SIZE):
+        super().__init__()
+        self.dataset = dataset
+        self.row_id = row_id
+        self.img_col = img_col
+        self.mode = mode
+        self.path = path
+        self.size = size
+        self.signals = DetailSignals()
+        self.is_interrupted = False  # Finestra chiusa prima della fine
+
+    def decode(self, open_image, size):
+        image = open_image()
+        if image.format == "JPEG":
+            image.draft("RGB", (size, size))
+        image.load()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        return pil_to_qimage(image)
+
+    def run(self):
+        try:
+            if self.mode == 'bytes':
+                with PERF.span("detail.read"):
+                    data = self.dataset.read_blob(self.row_id, self.img_col)
+                if not isinstance(data, bytes):
+                    raise ValueError("Immagine non disponibile")
+                open_image = lambda: Image.open(io.BytesIO(data))
+            else:
+                if not (isinstance(self.path, str) and os.path.exists(self.path)):
+                    raise FileNotFoundError("File mancante")
+                data = None
+                open_image = lambda: Image.open(self.path)
+            header = open_image()  # Legge solo l'intestazione: formato e dimensioni
+            self.signals.original.emit(data, header.format or "")
+            if header.format == "JPEG" and max(header.size) > 4 * self.size:
+                with PERF.span("detail.preview"):
+                    self.signals.image.emit(self.decode(open_image, self.size // 4), False)
+            if self.is_interrupted: return
+            with PERF.span("detail.decode"):
+                qimg = self.decode(open_image, self.size)
+            if qimg is None:
+                raise ValueError("Immagine non disponibile")
+            self.signals.image.emit(qimg, True)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+class ExportSignals(QObject):
+    progress = pyqtSignal(object)  # statistiche: done, total, bytes, errors, start
+    finished = pyqtSignal(object)  # statistiche finali (con 'cancelled' ed 'elapsed')
+    failed = pyqtSignal(str)
+
+class ExportWorker(QRunnable):
+    def __init__(self, dataset, meta_table, rows, img_col, mode, fmt, target):
+        super().__init__()
+        self.args = (dataset, meta_table, rows, img_col, mode, fmt, target)
+        self.target = target
+        self.signals = ExportSignals()
+        self.is_interrupted = False
+        self.setAutoDelete(False)
+
+    def run(self):
+        def progress(stats):
+            self.signals.progress.emit({**stats, "errors": sum(stats["errors"].values())})
+        try:
+            with PERF.span("export", format=self.args[5], rows=len(self.args[2])):
+                stats = export_rows(*self.args, progress=progress, cancelled=lambda: self.is_interrupted)
+            self.signals.finished.emit(stats)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
 
 # --- WIDGETS ---
-class ImageLabel(QLabel):
-    def __init__(self, row_data, parent=None):
+class ThumbnailModel(QStringListModel):
+    """
+    Modello virtuale sopra gli indici della vista corrente: la QListView chiede
+    solo gli elementi che disegna e le miniature arrivano dalla cache in memoria.
+    Nessun widget per elemento, qualunque sia la dimensione del dataset.
+
+    Deriva da QStringListModel (una lista di stringhe vuote) perché il layout di Qt
+    interroga rowCount() per ogni elemento: tenuto in C++ costa ~20 ms su 200k righe,
+    reimplementato in Python oltre un secondo.
+    """
+    RowIdRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, pixmap_cache, parent=None):
         super().__init__(parent)
-        self.row_data = row_data
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.setFixedSize(260, 260)
-        self.setStyleSheet("""
-            QLabel { border: 1px solid transparent; border-radius: 4px; }
-            QLabel:hover { border: 2px solid palette(highlight); background-color: palette(alternateBase); }
-        """)
-        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.pixmap_cache = pixmap_cache
+        self.rows = np.empty(0, dtype=np.int64)
+        self.fingerprint = None
+        self.tooltips = None
+        self.placeholder = QPixmap(THUMB_SIZE - 20, THUMB_SIZE - 20)
+        self.placeholder.fill(QColor(45, 45, 45))
+
+    def set_rows(self, rows, fingerprint, tooltips=None):
+        self.rows = rows
+        self.fingerprint = fingerprint
+        self.tooltips = tooltips
+        self.setStringList([""] * len(rows))  # Emette da sé il reset del modello
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row_id = int(self.rows[index.row()])
+        if role == Qt.ItemDataRole.DecorationRole:
+            pixmap = self.pixmap_cache.get((self.fingerprint, row_id))
+            return pixmap if pixmap is not None else self.placeholder
+        if role == Qt.ItemDataRole.ToolTipRole and self.tooltips is not None:
+            return str(self.tooltips.iat[row_id])
+        if role == self.RowIdRole:
+            return row_id
+        return None
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton:
-            self.window().show_details(self.row_data)
+    def thumbnail_ready(self, pos):
+        index = self.index(pos)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Disegna la miniatura centrata nella cella, con il bordo di hover dei vecchi QLabel."""
+
+    def paint(self, painter, option, index):
+        cell = option.rect.adjusted(5, 5, -5, -5)
+        painter.save()
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(QPen(option.palette.highlight().color(), 2))
+            painter.setBrush(option.palette.alternateBase())
+            painter.drawRoundedRect(cell, 4, 4)
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is not None:
+            size = pixmap.size().scaled(cell.size(), Qt.AspectRatioMode.KeepAspectRatio) \
+                if pixmap.width() > cell.width() or pixmap.height() > cell.height() else pixmap.size()
+            x = cell.x() + (cell.width() - size.width()) // 2
+            y = cell.y() + (cell.height() - size.height()) // 2
+            painter.drawPixmap(x, y, size.width(), size.height(), pixmap)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(THUMB_SIZE + 10, THUMB_SIZE + 10)
+
+
+class PerfPanel(QDockWidget):
+    """Pannello di debug: latenze per fase, hit rate delle cache e RSS, con export JSON / Chrome trace."""
+    COLUMNS = ("Fase", "N", "Media ms", "p50", "p95", "p99", "Max", "Totale s", "Distribuzione")
+    BARS = " ▁▂▃▄▅▆▇█"
+
+    def __init__(self, settings, parent=None):
+        super().__init__("Prestazioni", parent)
+        self.settings = settings
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        buttons = QHBoxLayout()
+        self.chk_enabled = QCheckBox("Registra")
+        self.chk_enabled.setChecked(PERF.enabled)
+        self.chk_enabled.toggled.connect(self.set_enabled)
+        buttons.addWidget(self.chk_enabled)
+        for text, slot in (("Azzera", self.reset), ("Esporta JSON...", self.export_json),
+                           ("Esporta trace...", self.export_trace)):
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            buttons.addWidget(btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        layout.addWidget(self.table)
+        self.lbl_caches = QLabel()
+        layout.addWidget(self.lbl_caches)
+        self.setWidget(widget)
+
+        # Aggiornato solo mentre è visibile
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(lambda visible: self.timer.start() if visible else self.timer.stop())
+
+    def set_enabled(self, enabled):
+        PERF.enabled = enabled
+        self.settings.setValue("instrumentation", "true" if enabled else "false")
+
+    def reset(self):
+        PERF.reset()
+        self.refresh()
+
+    def refresh(self):
+        snap = PERF.snapshot()
+        self.table.setRowCount(len(snap["stages"]))
+        for r, (name, st) in enumerate(snap["stages"].items()):
+            peak = max(st["histogram"].values())
+            bars = "".join(self.BARS[-(-n * (len(self.BARS) - 1) // peak)] for n in st["histogram"].values())
+            values = (name, st["count"], f"{st['mean_ms']:.2f}", f"{st['p50_ms']:.2f}", f"{st['p95_ms']:.2f}",
+                      f"{st['p99_ms']:.2f}", f"{st['max_ms']:.2f}", f"{st['total_ms'] / 1000:.2f}", bars)
+            for c, value in enumerate(values):
+                self.table.setItem(r, c, QTableWidgetItem(str(value)))
+        caches = [f"{name}: {c['hit_rate']:.0%} ({c['hits']}/{c['hits'] + c['misses']})"
+                  for name, c in snap["caches"].items() if c["hit_rate"] is not None]
+        self.lbl_caches.setText("  ·  ".join(caches + [f"RSS: {snap['rss_mb']:.0f} MB"]))
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Esporta statistiche", "kparquet-perf.json", "JSON (*.json)")
+        if path: PERF.export_json(path)
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Esporta trace", "kparquet-trace.json",
+                                              "Chrome trace (*.json)")
+        if path: PERF.export_chrome_trace(path)
 
 class DetailDialog(QDialog):
-    def __init__(self, row_data, img_col, mode, parent=None):
+    def __init__(self, row_data, img_col, mode, dataset=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Ispezione Immagine (Drag & Drop abilitato)")
         self.resize(1100, 750)
@@ -221,30 +2004,16 @@ class DetailDialog(QDialog):
         self.img_lbl.setMinimumWidth(500)
         content_layout.addWidget(self.img_lbl, 2)
         
-        # Caricamento SAFE immagine full size
-        try:
-            val = row_data[img_col]
-            img = None
-            path_for_drag = None
-
-            if mode == 'path' and isinstance(val, str) and os.path.exists(val):
-                img = Image.open(val)
-                path_for_drag = val # Salviamo il path per il drag
-            elif mode == 'bytes':
-                b = val['bytes'] if isinstance(val, dict) else val
-                img = Image.open(io.BytesIO(b))
-                # path_for_drag rimane None, il widget creerà un temp file
-            
-            if img:
-                pix = pil_to_pixmap_robust(img)
-                if pix:
-                    scaled = pix.scaled(800, 800, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    # Passiamo sia la pixmap che il path (se c'è) al widget draggable
-                    self.img_lbl.set_content(scaled, path_for_drag)
-            else:
-                self.img_lbl.setText("Immagine non disponibile")
-        except Exception as e:
-            self.img_lbl.setText(f"Errore: {str(e)}")
+        # Immagine letta e decodificata nel pool globale: la finestra si apre subito
+        path = row_data.get(img_col)
+        self.image_name = path if isinstance(path, str) else None  # Anche il 'path' degli struct HuggingFace
+        self.path_for_drag = path if mode == 'path' else None  # Per i file su disco si trascina l'originale
+        self.img_lbl.setText("Caricamento...")
+        self.loader = DetailLoaderWorker(dataset, row_data.name, img_col, mode, path)
+        self.loader.signals.original.connect(self.set_original)
+        self.loader.signals.image.connect(self.show_image)
+        self.loader.signals.failed.connect(self.show_error)
+        QThreadPool.globalInstance().start(self.loader)
 
         # Metadati
         txt_info = QTextEdit()
@@ -260,6 +2029,22 @@ class DetailDialog(QDialog):
 
         main_layout.addLayout(content_layout)
 
+    def set_original(self, data, image_format):
+        self.img_lbl.set_original(data, image_format, self.image_name)
+
+    def show_error(self, message):
+        self.img_lbl.setText(f"Errore: {message}")
+
+    def show_image(self, qimg, final):
+        # Come prima, l'immagine riempie il riquadro; l'anteprima a bassa scala ne occupa già lo spazio
+        mode = Qt.TransformationMode.SmoothTransformation if final else Qt.TransformationMode.FastTransformation
+        pix = QPixmap.fromImage(qimg).scaled(DETAIL_SIZE, DETAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio, mode)
+        self.img_lbl.set_content(pix, self.path_for_drag)
+
+    def done(self, result):
+        self.loader.is_interrupted = True
+        super().done(result)
+
     def copy_to_clip(self, text):
         QApplication.clipboard().setText(text)
 
@@ -272,9 +2057,11 @@ class DetailDialog(QDialog):
         QApplication.clipboard().setText(str(row.to_dict()))
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, source=None):
         super().__init__()
         self.settings = QSettings(ORG_NAME, APP_NAME)
+        if self.settings.value("instrumentation", "false") == "true":
+            PERF.enabled = True
         
         geom = self.settings.value("geometry")
         if geom: self.restoreGeometry(geom)
@@ -282,23 +2069,82 @@ class MainWindow(QMainWindow):
         
         self.setWindowTitle(APP_NAME)
         self.threadpool = QThreadPool()
+        # Ricerca e indice su un pool a parte: non aspettano che si liberi un thread di decodifica
+        self.search_pool = QThreadPool()
+        self.search_pool.setMaxThreadCount(2)
+        self.decode_workers = max(1, int(self.settings.value("decode_workers", DECODE_WORKERS)))
+        self.threadpool.setMaxThreadCount(self.decode_workers)
+        self.process_pool = None
+        if self.settings.value("decode_backend", DECODE_BACKEND) == "process":
+            # spawn: niente fork di un processo con thread Qt attivi
+            self.process_pool = ProcessPoolExecutor(max_workers=self.decode_workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+        self.page_workers = set()     # Worker della pagina visibile
+        self.running_workers = set()  # Riferimenti ai worker avviati, fino a 'finished'
+        self.page_generation = 0  # Incrementata a ogni richiesta di miniature
+        self.view_generation = 0  # Prima generazione della vista corrente (risultati più vecchi scartati)
+        self.loading_range = (0, 0)  # Posizioni già richieste ai worker della generazione corrente
+        self.scroll_target = None  # Posizione da tenere in cima finché l'utente non scorre
+        self.request_started = 0.0
+        self.dataset_generation = 0  # Prima generazione del file aperto (per scartare prefetch vecchi)
+        self.thumb_cache = self.open_thumb_cache()
+        self.pixmap_cache = PixmapCache(int(self.settings.value("memory_cache_mb", PIXMAP_CACHE_MB)))
+        self.prefetch_pages = int(self.settings.value("prefetch_pages", PREFETCH_PAGES))
+        self.prefetch_workers = {}  # pagina -> worker di prefetch in coda/in corso
+        self.fingerprint = None
         
-        self.df_full = None      
-        self.df_current = None   
+        self.dataset = None      # Accesso lazy al file
+        self.meta_table = None   # Metadati leggeri in formato Arrow (niente blob immagine)
+        self.df_full = None      # Gli stessi metadati come DataFrame
+        self.search_engine = None
+        self.search_generation = 0
+        self.filter_rows = None  # Righe che soddisfano il filtro strutturato (None = nessun filtro)
+        self.filter_text = ""
+        self.base_rows = None    # Risultato di ricerca + filtro, in ordine naturale
+        self.view_key = ("", "")  # (query, filtro) che ha prodotto base_rows
+        self.sort_index = None
+        self.sort_key = None     # (colonna, "ascending"/"descending") oppure None
+        self.view_rows = None    # Indici globali delle righe visibili (filtro + ordine)
         
         self.img_col = None
         self.load_mode = 'bytes'
+        self.image_columns = []  # Colonne immagine candidate [(colonna, modalità)]
+        self.open_pool = QThreadPool()  # Aperture dei file (quella superata finisce il passo in corso)
+        self.open_worker = None
+        self.open_generation = 0
+        self.open_started = 0.0
+        self.open_label = ""
+        self.export_worker = None
+        self.export_progress = None
         self.page_size = 50
         self.current_page = 0
         self.total_pages = 0
 
         self.init_ui()
         
-        last_file = self.settings.value("last_file")
-        if last_file and isinstance(last_file, str) and os.path.exists(last_file):
-            self.load_parquet(last_file)
+        # Sorgente da riga di comando (file, cartella o glob), altrimenti l'ultima aperta con la sua colonna
+        last_file = source if source is not None else self.settings.value("last_file")
+        last_col = self.settings.value("last_image_column") if source is None else None
+        if isinstance(last_file, list) and last_file and all(os.path.exists(p) for p in last_file):
+            self.load_parquet(last_file, last_col)
+        elif last_file and isinstance(last_file, str) and (os.path.exists(last_file) or glob.glob(last_file)):
+            self.load_parquet(last_file, last_col)
+
+    def open_thumb_cache(self):
+        try:
+            max_mb = int(self.settings.value("thumb_cache_mb", THUMB_CACHE_MB))
+            return ThumbnailCache(max_mb=max_mb)
+        except (OSError, sqlite3.Error, ValueError) as e:
+            print(f"Cache miniature disattivata: {e}")
+            return None
 
     def init_ui(self):
+        # Ricerca mentre si digita: parte quando l'utente si ferma per un attimo
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(int(self.settings.value("search_debounce_ms", SEARCH_DEBOUNCE_MS)))
+        self.search_timer.timeout.connect(self.perform_search)
+
         toolbar = QToolBar("Main")
         toolbar.setMovable(False)
         self.addToolBar(toolbar)
@@ -307,8 +2153,22 @@ class MainWindow(QMainWindow):
         act_open = QAction(style.standardIcon(QStyle.StandardPixmap.SP_DialogOpenButton), "Apri", self)
         act_open.triggered.connect(self.open_file_dialog)
         toolbar.addAction(act_open)
+        act_open_dir = QAction(style.standardIcon(QStyle.StandardPixmap.SP_DirOpenIcon), "Apri Cartella", self)
+        act_open_dir.triggered.connect(self.open_dir_dialog)
+        toolbar.addAction(act_open_dir)
+        self.act_export = QAction(style.standardIcon(QStyle.StandardPixmap.SP_DialogSaveButton), "Esporta vista", self)
+        self.act_export.triggered.connect(self.export_view)
+        toolbar.addAction(self.act_export)
         toolbar.addSeparator()
 
+        # Visibile solo se il dataset ha più colonne immagine
+        self.image_label = toolbar.addWidget(QLabel(" Immagine: "))
+        self.combo_image = QComboBox()
+        self.combo_image.currentIndexChanged.connect(self.change_image_column)
+        self.image_combo_action = toolbar.addWidget(self.combo_image)
+        self.image_label.setVisible(False)
+        self.image_combo_action.setVisible(False)
+
         toolbar.addWidget(QLabel(" Ordina: "))
         self.combo_sort = QComboBox()
         self.combo_sort.addItems(["Default", "Nome File (A-Z)", "Data Recente"])
@@ -320,11 +2180,21 @@ class MainWindow(QMainWindow):
         self.search_bar.setPlaceholderText("Cerca...")
         self.search_bar.setFixedWidth(200)
         self.search_bar.returnPressed.connect(self.perform_search)
+        self.search_bar.textChanged.connect(self.search_timer.start)
         toolbar.addWidget(self.search_bar)
         
         btn_search = QPushButton("Vai")
         btn_search.clicked.connect(self.perform_search)
         toolbar.addWidget(btn_search)
+        toolbar.addSeparator()
+
+        self.filter_bar = QLineEdit()
+        self.filter_bar.setPlaceholderText('Filtro (es. width>=1024 and score>6)')
+        self.filter_bar.setToolTip("Operatori: == != > >= < <=, ~ (contiene), in (a, b), and/or/not, parentesi.\n"
+                                   'Esempio: width>=1024 and aesthetic_score>6 and source=="laion"')
+        self.filter_bar.setMinimumWidth(260)
+        self.filter_bar.returnPressed.connect(self.apply_filter)
+        toolbar.addWidget(self.filter_bar)
 
         # Bottom Bar
         nav_widget = QWidget()
@@ -361,14 +2231,36 @@ class MainWindow(QMainWindow):
         bottom_toolbar.addWidget(nav_widget)
         self.addToolBar(Qt.ToolBarArea.BottomToolBarArea, bottom_toolbar)
 
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setFrameShape(QScrollArea.Shape.NoFrame)
-        self.grid_container = QWidget()
-        self.grid = QGridLayout(self.grid_container)
-        self.grid.setSpacing(10)
-        self.scroll.setWidget(self.grid_container)
-        self.setCentralWidget(self.scroll)
+        # Griglia virtualizzata: scorre su tutta la vista, disegna solo ciò che è visibile
+        self.model = ThumbnailModel(self.pixmap_cache, self)
+        self.view = QListView()
+        # ListMode a capo, non IconMode: solo così uniformItemSizes evita di misurare ogni elemento
+        self.view.setFlow(QListView.Flow.LeftToRight)
+        self.view.setWrapping(True)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setUniformItemSizes(True)
+        self.view.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.view.setIconSize(QSize(THUMB_SIZE, THUMB_SIZE))
+        self.view.setGridSize(QSize(THUMB_SIZE + 10, THUMB_SIZE + 10))
+        self.view.setFrameShape(QListView.Shape.NoFrame)
+        self.view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.view.setMouseTracking(True)
+        self.view.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.view.setItemDelegate(ThumbnailDelegate(self.view))
+        self.view.setModel(self.model)
+        self.view.clicked.connect(self.on_item_clicked)
+        self.setCentralWidget(self.view)
+
+        # Le richieste di miniature seguono lo scroll, con un minimo di debounce
+        self.visible_timer = QTimer(self)
+        self.visible_timer.setSingleShot(True)
+        self.visible_timer.setInterval(30)
+        self.visible_timer.timeout.connect(self.request_visible)
+        scrollbar = self.view.verticalScrollBar()
+        scrollbar.valueChanged.connect(lambda _: self.visible_timer.start())
+        scrollbar.rangeChanged.connect(self.follow_scroll_target)
+        scrollbar.actionTriggered.connect(self.release_scroll_target)
 
         self.status = QStatusBar()
         self.setStatusBar(self.status)
@@ -377,6 +2269,14 @@ class MainWindow(QMainWindow):
         self.progress.setVisible(False)
         self.status.addPermanentWidget(self.progress)
 
+        # Strumentazione opzionale (F12): pannello agganciabile, nascosto di default
+        self.perf_panel = PerfPanel(self.settings, self)
+        self.perf_panel.hide()
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.perf_panel)
+        act_perf = self.perf_panel.toggleViewAction()
+        act_perf.setShortcut("F12")
+        self.addAction(act_perf)
+
     def update_pagination_controls(self):
         if self.total_pages == 0: return
         self.slider.blockSignals(True)
@@ -385,7 +2285,7 @@ class MainWindow(QMainWindow):
         self.slider.setValue(self.current_page)
         self.spin_page.setRange(1, self.total_pages)
         self.spin_page.setValue(self.current_page)
-        self.lbl_total.setText(f" / {self.total_pages} (Tot: {len(self.df_current)})")
+        self.lbl_total.setText(f" / {self.total_pages} (Tot: {len(self.view_rows)})")
         self.btn_prev.setEnabled(self.current_page > 1)
         self.btn_next.setEnabled(self.current_page < self.total_pages)
         self.slider.blockSignals(False)
@@ -404,117 +2304,488 @@ class MainWindow(QMainWindow):
         target_page = self.spin_page.value()
         if target_page != self.current_page: self.load_page(target_page)
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Il relayout cambia il numero di colonne: resta ancorata la prima miniatura visibile
+        if self.view_rows is not None and len(self.view_rows) and self.scroll_target is None:
+            self.scroll_target = self.visible_range()[0]
+        self.visible_timer.start()
+
     def closeEvent(self, event):
         self.settings.setValue("geometry", self.saveGeometry())
+        if self.open_worker is not None:
+            self.open_worker.is_interrupted = True
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
         super().closeEvent(event)
 
     def open_file_dialog(self):
         last_dir = self.settings.value("last_dir", "")
-        path, _ = QFileDialog.getOpenFileName(self, "Apri Parquet", str(last_dir), "Parquet (*.parquet);;All (*)")
+        paths, _ = QFileDialog.getOpenFileNames(self, "Apri Parquet", str(last_dir), "Parquet (*.parquet);;All (*)")
+        if paths:
+            # Più file selezionati = shard dello stesso dataset
+            self.settings.setValue("last_dir", os.path.dirname(paths[0]))
+            self.load_parquet(paths[0] if len(paths) == 1 else paths)
+
+    def open_dir_dialog(self):
+        last_dir = self.settings.value("last_dir", "")
+        path = QFileDialog.getExistingDirectory(self, "Apri cartella dataset", str(last_dir))
         if path:
-            self.settings.setValue("last_dir", os.path.dirname(path))
+            self.settings.setValue("last_dir", path)
             self.load_parquet(path)
 
-    def load_parquet(self, path):
-        self.status.showMessage(f"Lettura: {path}...")
-        QApplication.processEvents()
+    def load_parquet(self, path, img_col=None):
+        # L'apertura gira nel pool: la finestra resta reattiva e una nuova apertura annulla la precedente
+        if self.open_worker is not None:
+            self.open_worker.is_interrupted = True
+        self.open_generation += 1
+        self.open_started = time.perf_counter()
+        worker = OpenWorker(path, img_col, self.open_generation)
+        worker.signals.opened.connect(self.on_opened)
+        worker.signals.loaded.connect(self.on_loaded)
+        worker.signals.progress.connect(self.on_open_progress)
+        worker.signals.failed.connect(self.on_open_failed)
+        worker.signals.finished.connect(self.open_done)
+        self.open_worker = worker
+        self.open_label = worker.label
+        self.running_workers.add(worker)
+        self.status.showMessage(f"Lettura: {worker.label}...")
+        self.open_pool.start(worker)
+
+    def on_opened(self, generation, result):
+        if generation != self.open_generation: return
+        # Footer e primo row group pronti: la griglia parte mentre il resto dei metadati si legge
+        dataset = result.dataset
+        self.cancel_prefetch()
+        self.dataset_generation = self.page_generation + 1
+        self.dataset = dataset
+        self.meta_table = None
+        self.df_full = result.df
+        self.fingerprint = result.fingerprint
+        self.search_engine = None
+        self.sort_index = None
+        self.img_col = result.img_col
+        self.load_mode = result.mode
+        self.image_columns = result.candidates
+        self.populate_image_options()
+        self.settings.setValue("last_file", dataset.source)
+        self.settings.setValue("last_image_column", result.img_col)
+        self.status.showMessage(f"{self.open_label}: {dataset.num_rows} righe in {len(dataset.paths)} file, "
+                                f"lettura metadati...")
+        self.search_bar.blockSignals(True)
+        self.search_bar.clear()
+        self.search_bar.blockSignals(False)
+        self.search_generation += 1
+        self.filter_rows = None
+        self.filter_text = ""
+        self.filter_bar.clear()
+        self.combo_sort.blockSignals(True)
+        self.combo_sort.clear()
+        self.combo_sort.blockSignals(False)
+        self.sort_key = None
+        self.set_queries_enabled(False)
+        self.view_rows = np.arange(len(result.df), dtype=np.int64)
+        self.base_rows = self.view_rows
+        self.view_key = ("", "")
+        self.show_view()
+        if PERF.enabled:
+            PERF.record("open.preview", self.open_started, time.perf_counter() - self.open_started)
+
+    def on_loaded(self, generation, result):
+        if generation != self.open_generation: return
+        dataset = self.dataset
+        self.meta_table = result.meta_table
+        self.df_full = result.df
+        indices = index_dir(self.fingerprint)
+        touch_index_dir(indices)
+        prune_indices(int(self.settings.value("index_cache_mb", INDEX_CACHE_MB)), keep=indices)
+        self.search_engine = SearchEngine(self.meta_table)
+        if self.settings.value("search_index", "true") == "true":
+            build = dataset.num_rows <= int(self.settings.value("search_index_max_rows", INDEX_MAX_ROWS))
+            self.search_pool.start(IndexBuilderWorker(self.search_engine, indices, build), -1)
+        self.sort_index = SortIndex(self.meta_table, directory=indices)
+        self.populate_sort_options()
+        self.set_queries_enabled(True)
+        self.status.showMessage(f"{self.open_label}: {dataset.num_rows} righe in {len(dataset.paths)} file")
+        if len(self.view_rows) != dataset.num_rows:
+            # Tutte le righe: si resta sulla posizione che l'utente sta guardando
+            position = self.visible_range()[0] if len(self.view_rows) else 0
+            self.view_rows = np.arange(dataset.num_rows, dtype=np.int64)
+            self.base_rows = self.view_rows
+            self.show_view(position)
+        if PERF.enabled:
+            PERF.record("open.total", self.open_started, time.perf_counter() - self.open_started,
+                        {"source": self.open_label})
+
+    def on_open_progress(self, generation, message):
+        if generation == self.open_generation:
+            self.status.showMessage(message)
+
+    def on_open_failed(self, generation, message):
+        if generation != self.open_generation: return
+        QMessageBox.critical(self, "Errore", message)
+        self.status.showMessage("Errore caricamento.")
+
+    def open_done(self, worker):
+        self.running_workers.discard(worker)
+        if worker is self.open_worker:
+            self.open_worker = None
+
+    def set_queries_enabled(self, enabled):
+        # Ricerca, filtri e ordinamento richiedono i metadati completi
+        for widget in (self.search_bar, self.filter_bar, self.combo_sort, self.combo_image, self.act_export):
+            widget.setEnabled(enabled)
+
+    def populate_image_options(self):
+        self.combo_image.blockSignals(True)
+        self.combo_image.clear()
+        for col, mode in self.image_columns:
+            self.combo_image.addItem(f"{col} ({mode})", col)
+        self.combo_image.setCurrentIndex(self.combo_image.findData(self.img_col))
+        self.combo_image.blockSignals(False)
+        multiple = len(self.image_columns) > 1
+        self.image_label.setVisible(multiple)
+        self.image_combo_action.setVisible(multiple)
+
+    def change_image_column(self, index):
+        col = self.combo_image.itemData(index)
+        if self.dataset is None or col is None or col == self.img_col: return
+        # Metadati, cache e indici dipendono dalla colonna immagine: si riapre il dataset
+        self.load_parquet(self.dataset.source, col)
+
+    def populate_sort_options(self):
+        # Preset storici + qualunque colonna ordinabile, nei due versi
+        self.combo_sort.blockSignals(True)
+        self.combo_sort.clear()
+        self.combo_sort.addItem("Default", None)
+        names = self.meta_table.column_names
+        if self.img_col in names:
+            self.combo_sort.addItem("Nome File (A-Z)", (self.img_col, "ascending"))
+        date_col = next((c for c in ['created_at', 'modified_at', 'timestamp'] if c in names), None)
+        if date_col:
+            self.combo_sort.addItem("Data Recente", (date_col, "descending"))
+        for field in self.meta_table.schema:
+            if is_sortable_type(field.type):
+                self.combo_sort.addItem(f"{field.name} ↑", (field.name, "ascending"))
+                self.combo_sort.addItem(f"{field.name} ↓", (field.name, "descending"))
+        self.sort_key = None
+        self.combo_sort.blockSignals(False)
+
+    def refresh_view(self):
         try:
-            self.df_full = pd.read_parquet(path)
-            self.df_current = self.df_full
-            self.img_col = None
-            self.load_mode = 'bytes'
-            
-            for col in self.df_full.columns:
-                if "path" in col.lower() or "file" in col.lower():
-                    val = self.df_full[col].dropna().iloc[0] if not self.df_full[col].empty else None
-                    if isinstance(val, str) and (val.lower().endswith(('.jpg', '.png', '.webp'))):
-                        self.img_col = col
-                        self.load_mode = 'path'
-                        break
-            if not self.img_col:
-                for col in self.df_full.columns:
-                    val = self.df_full[col].iloc[0]
-                    if (isinstance(val, dict) and 'bytes' in val) or isinstance(val, bytes):
-                        self.img_col = col
-                        self.load_mode = 'bytes'
-                        break
-            if not self.img_col and 'image_path' in self.df_full.columns:
-                 self.img_col = 'image_path'
-                 self.load_mode = 'path'
-
-            if not self.img_col:
-                QMessageBox.critical(self, "Errore", "Nessuna colonna immagine trovata.")
-                return
-
-            self.settings.setValue("last_file", path)
-            self.search_bar.clear()
-            self.update_pagination_state()
-            self.load_page(1)
-        except Exception as e:
-            QMessageBox.critical(self, "Errore", str(e))
-            self.status.showMessage("Errore caricamento.")
+            self.view_rows = self.sort_index.sorted_view(self.base_rows, self.sort_key, self.view_key)
+        except pa.ArrowException as e:
+            self.status.showMessage(f"Ordinamento non riuscito: {e}")
+            self.view_rows = self.base_rows
 
     def apply_sort(self, index):
-        if self.df_current is None or self.df_current.empty: return
-        criteria = self.combo_sort.itemText(index)
-        try:
-            if "Nome File" in criteria and self.img_col:
-                self.df_current = self.df_current.sort_values(by=self.img_col, ascending=True)
-            elif "Data Recente" in criteria:
-                col = next((c for c in ['created_at', 'modified_at', 'timestamp'] if c in self.df_current.columns), None)
-                if col: self.df_current = self.df_current.sort_values(by=col, ascending=False)
-            self.load_page(1)
-        except Exception: pass
+        if self.sort_index is None: return
+        self.sort_key = self.combo_sort.itemData(index)
+        with PERF.span("sort", key=self.sort_key):
+            self.refresh_view()
+        self.show_view()
 
     def perform_search(self):
-        if self.df_full is None: return
+        self.search_timer.stop()
+        if self.search_engine is None: return
         query = self.search_bar.text().strip().lower()
+        self.search_generation += 1
+        self.view_key = (query, self.filter_text)
         if not query:
-            self.df_current = self.df_full
+            self.apply_search_result(self.search_generation, np.arange(self.dataset.num_rows, dtype=np.int64))
+            return
+        # Il confronto gira nel pool: la GUI resta reattiva mentre si digita
+        self.status.showMessage(f"Ricerca: {query}...")
+        worker = SearchWorker(self.search_engine, query, self.search_generation)
+        worker.signals.result.connect(self.apply_search_result)
+        self.search_pool.start(worker)
+
+    def apply_search_result(self, generation, rows):
+        if generation != self.search_generation: return  # Query nel frattempo superata
+        self.status.clearMessage()
+        rows = rows.astype(np.int64)
+        if self.filter_rows is not None:
+            rows = rows[np.isin(rows, self.filter_rows, assume_unique=True)]
+        # L'ordinamento scelto resta valido anche dopo una nuova ricerca
+        self.base_rows = rows
+        with PERF.span("search.apply", rows=len(rows)):
+            self.refresh_view()
+        self.show_view()
+
+    def apply_filter(self):
+        if self.meta_table is None: return
+        text = self.filter_bar.text().strip()
+        if not text:
+            self.filter_rows = None
+            self.filter_text = ""
         else:
-            mask = self.df_full.astype(str).apply(lambda x: x.str.contains(query, case=False)).any(axis=1)
-            self.df_current = self.df_full[mask]
-        self.update_pagination_state()
-        self.load_page(1)
+            self.status.showMessage(f"Filtro: {text}...")
+            QApplication.processEvents()
+            try:
+                with PERF.span("filter", filter=text):
+                    expression, columns = compile_filter(text, self.meta_table.schema)
+                    self.filter_rows = self.dataset.filter_rows(expression, columns, self.meta_table)
+                self.filter_text = text
+            except (FilterError, pa.ArrowException) as e:
+                self.status.showMessage(f"Filtro non valido: {e}")
+                return
+        # Il risultato si combina con la ricerca testuale corrente
+        self.perform_search()
 
     def update_pagination_state(self):
-        if self.df_current is None: return
-        total_rows = len(self.df_current)
+        if self.view_rows is None: return
+        total_rows = len(self.view_rows)
         self.total_pages = (total_rows // self.page_size) + (1 if total_rows % self.page_size > 0 else 0)
         if self.total_pages == 0: self.total_pages = 1
         self.update_pagination_controls()
 
-    def load_page(self, page_num):
-        while self.grid.count():
-            w = self.grid.takeAt(0).widget()
-            if w: w.deleteLater()
-
-        if self.df_current.empty: return
+    def show_view(self, position=0):
+        # Nuova vista (file, ricerca, filtro o ordinamento): il modello si azzera
+        self.view_generation = self.page_generation + 1
+        self.cancel_page_workers()
+        self.cancel_prefetch()
+        self.loading_range = (0, 0)
+        tooltips = self.df_full[self.img_col] if self.img_col in self.df_full.columns else None
+        with PERF.span("gui.model_reset", rows=len(self.view_rows)):
+            self.model.set_rows(self.view_rows, self.fingerprint, tooltips)
+        self.update_pagination_state()
+        self.scroll_to(position)
 
-        self.current_page = page_num
+    def load_page(self, page_num):
+        # Le "pagine" ora sono solo posizioni di scroll nella griglia continua
+        self.scroll_to((page_num - 1) * self.page_size)
+
+    def scroll_to(self, position):
+        if self.view_rows is None or len(self.view_rows) == 0:
+            self.cancel_page_workers()
+            self.cancel_prefetch()
+            self.progress.setVisible(False)
+            return
+        self.current_page = position // self.page_size + 1
+        self.scroll_target = position
+        self.follow_scroll_target()
+        # La richiesta parte subito: il timer innescato dallo scroll la ripeterebbe soltanto
+        self.visible_timer.stop()
+        self.request_visible()
+
+    def follow_scroll_target(self):
+        # Il relayout della vista è differito: dopo ogni cambio di geometria lo scroll va ripetuto
+        if self.scroll_target is None or self.scroll_target >= len(self.model.rows): return
+        self.view.scrollTo(self.model.index(self.scroll_target), QListView.ScrollHint.PositionAtTop)
+
+    def release_scroll_target(self, action):
+        # Scroll dell'utente: non si insegue più la pagina richiesta
+        self.scroll_target = None
+
+    def visible_range(self):
+        # Griglia uniforme: prima e ultima posizione visibile si calcolano dallo scroll
+        grid = self.view.gridSize()
+        cols = max(1, self.view.viewport().width() // grid.width())
+        first = (self.view.verticalScrollBar().value() // grid.height()) * cols
+        last = first + cols * (self.view.viewport().height() // grid.height() + 2) - 1
+        n = len(self.view_rows)
+        return min(first, n - 1), min(last, n - 1), cols
+
+    def request_visible(self):
+        if self.view_rows is None or len(self.view_rows) == 0: return
+        first, last, cols = self.visible_range()
+        # La pagina è quella dell'ultima cella della prima riga visibile (l'inizio pagina può stare a metà riga)
+        self.current_page = min(first + cols - 1, len(self.view_rows) - 1) // self.page_size + 1
         self.update_pagination_controls()
-        
-        start = (page_num - 1) * self.page_size
-        end = start + self.page_size
-        df_slice = self.df_current.iloc[start:end]
 
-        self.progress.setVisible(True)
-        self.progress.setRange(0, len(df_slice))
+        margin = last - first + 1
+        lo, hi = max(0, first - margin), min(len(self.view_rows), last + 1 + margin)
+        if (lo, hi) == self.loading_range and self.page_workers:
+            return  # Stessa zona già in caricamento: i worker in corso restano validi
+
+        # Nuova generazione: le richieste per la zona precedente non servono più
+        self.page_generation += 1
+        self.cancel_page_workers()
+        self.loading_range = (lo, hi)
+        # Prima le posizioni visibili, poi il margine sotto e sopra
+        order = list(range(first, last + 1)) + list(range(last + 1, hi)) + list(range(first - 1, lo - 1, -1))
+        missing = [p for p in order if (self.fingerprint, int(self.view_rows[p])) not in self.pixmap_cache]
+        PERF.hit("thumb.memory_cache", len(order) - len(missing), len(missing))
+
+        self.progress.setRange(0, len(missing))
         self.progress.setValue(0)
-        
-        worker = ImageLoaderWorker(df_slice, start, self.img_col, self.load_mode)
-        worker.signals.result.connect(self.add_item)
-        worker.signals.finished.connect(lambda: self.progress.setVisible(False))
-        self.threadpool.start(worker)
-
-    def add_item(self, idx, pixmap, row):
-        relative_idx = idx % self.page_size
-        r, c = divmod(relative_idx, 5)
-        lbl = ImageLabel(row, self)
-        lbl.setPixmap(pixmap)
-        lbl.setToolTip(f"{row.get(self.img_col, '')}")
-        self.grid.addWidget(lbl, r, c)
-        self.progress.setValue(self.progress.value() + 1)
+        self.progress.setVisible(bool(missing))
+        self.request_started = time.perf_counter()
+
+        # Righe mancanti divise in blocchi, uno per thread del pool
+        chunk = max(1, -(-len(missing) // self.decode_workers))
+        for k in range(0, len(missing), chunk):
+            positions = missing[k:k + chunk]
+            worker = ImageLoaderWorker(self.dataset, self.df_full.iloc[self.view_rows[positions]], positions,
+                                       self.img_col, self.load_mode, self.thumb_cache, self.fingerprint,
+                                       self.process_pool, self.page_generation, self.current_page)
+            worker.signals.result.connect(self.add_image)
+            worker.signals.finished.connect(self.chunk_done)
+            self.page_workers.add(worker)
+            self.running_workers.add(worker)
+            self.threadpool.start(worker)
+
+        self.cancel_prefetch(keep=self.prefetch_window(self.current_page))
+        self.schedule_prefetch(self.current_page)
+
+    def cancel_page_workers(self):
+        # Quelli ancora in coda vengono tolti, quelli già partiti si fermano alla prossima immagine
+        for worker in self.page_workers:
+            self.stop_worker(worker)
+        self.page_workers = set()
+
+    def stop_worker(self, worker):
+        worker.is_interrupted = True
+        if self.threadpool.tryTake(worker):
+            # Mai partito: non emetterà 'finished', lo rilasciamo subito
+            self.running_workers.discard(worker)
+
+    def chunk_done(self, worker):
+        self.running_workers.discard(worker)
+        if worker.generation != self.page_generation: return
+        self.page_workers.discard(worker)
+        if not self.page_workers:
+            self.progress.setVisible(False)
+            # Dalla richiesta all'ultima miniatura della zona visibile
+            if PERF.enabled:
+                PERF.record("gui.visible_ready", self.request_started, time.perf_counter() - self.request_started)
+
+    def prefetch_window(self, page_num):
+        pages = []
+        for d in range(1, self.prefetch_pages + 1):
+            pages += [p for p in (page_num + d, page_num - d) if 1 <= p <= self.total_pages]
+        return pages
+
+    def schedule_prefetch(self, page_num):
+        # Pagine vicine decodificate a bassa priorità: i worker della pagina visibile passano avanti
+        for p in self.prefetch_window(page_num):
+            if p in self.prefetch_workers: continue
+            start = (p - 1) * self.page_size
+            lo, hi = self.loading_range
+            positions = [pos for pos in range(start, min(start + self.page_size, len(self.view_rows)))
+                         if not lo <= pos < hi and (self.fingerprint, int(self.view_rows[pos])) not in self.pixmap_cache]
+            if not positions: continue
+            worker = ImageLoaderWorker(self.dataset, self.df_full.iloc[self.view_rows[positions]], positions,
+                                       self.img_col, self.load_mode, self.thumb_cache, self.fingerprint,
+                                       self.process_pool, self.page_generation, p)
+            worker.signals.result.connect(self.store_prefetched)
+            worker.signals.finished.connect(self.prefetch_done)
+            self.prefetch_workers[p] = worker
+            self.running_workers.add(worker)
+            self.threadpool.start(worker, -1)
+
+    def cancel_prefetch(self, keep=()):
+        # Rimuove dalla coda (o interrompe) il prefetch delle pagine non più vicine
+        for p in [p for p in self.prefetch_workers if p not in keep]:
+            self.stop_worker(self.prefetch_workers.pop(p))
+
+    def prefetch_done(self, worker):
+        self.running_workers.discard(worker)
+        if self.prefetch_workers.get(worker.page) is worker:
+            del self.prefetch_workers[worker.page]
+
+    def store_prefetched(self, generation, idx, qimg, row):
+        if generation < self.dataset_generation: return  # Prefetch di un file non più aperto
+        self.pixmap_cache.put((self.fingerprint, row.name), QPixmap.fromImage(qimg))
+        self.refresh_item(generation, idx, row)
+
+    def add_image(self, generation, idx, qimg, row):
+        # Risultati di una vista superata: scartati prima di toccare il modello
+        if generation < self.view_generation: return
+        with PERF.span("gui.add_image"):
+            self.pixmap_cache.put((self.fingerprint, row.name), QPixmap.fromImage(qimg))
+            self.refresh_item(generation, idx, row)
+        if generation == self.page_generation:
+            self.progress.setValue(self.progress.value() + 1)
+
+    def refresh_item(self, generation, idx, row):
+        if generation >= self.view_generation and idx < len(self.view_rows) and self.view_rows[idx] == row.name:
+            self.model.thumbnail_ready(idx)
+
+    def export_view(self):
+        # Le righe della vista corrente (ricerca + filtro + ordinamento), fotografate ora
+        if self.meta_table is None or self.view_rows is None or len(self.view_rows) == 0: return
+        if self.export_worker is not None:
+            self.status.showMessage("Esportazione già in corso.")
+            return
+        labels = list(EXPORT_FORMATS.values())
+        label, ok = QInputDialog.getItem(self, "Esporta vista", f"{len(self.view_rows)} righe come:", labels, 0, False)
+        if not ok: return
+        fmt = list(EXPORT_FORMATS)[labels.index(label)]
+        last_dir = str(self.settings.value("export_dir", self.settings.value("last_dir", "")))
+        if fmt == 'dir':
+            target = QFileDialog.getExistingDirectory(self, "Cartella di destinazione", last_dir)
+            if target and os.path.isdir(target) and os.listdir(target):
+                QMessageBox.warning(self, "Esporta vista", f"La cartella {target} non è vuota: scegline una vuota.")
+                return
+        else:
+            ext = ".parquet" if fmt == 'parquet' else ".tar"
+            target, _ = QFileDialog.getSaveFileName(self, "Esporta come", os.path.join(last_dir, "export" + ext),
+                                                    f"{label} (*{ext})")
+            if target and not target.endswith(ext):
+                target += ext
+        if not target: return
+        self.settings.setValue("export_dir", target if fmt == 'dir' else os.path.dirname(target))
+
+        worker = ExportWorker(self.dataset, self.meta_table, self.view_rows.copy(), self.img_col, self.load_mode,
+                              fmt, target)
+        worker.signals.progress.connect(self.export_step)
+        worker.signals.finished.connect(self.export_done)
+        worker.signals.failed.connect(self.export_failed)
+        self.export_worker = worker
+        self.running_workers.add(worker)
+        # Non modale: si può continuare a navigare mentre l'esportazione procede
+        self.export_progress = QProgressDialog(f"Esportazione in {target}...", "Annulla", 0, len(self.view_rows), self)
+        self.export_progress.setWindowTitle("Esporta vista")
+        self.export_progress.setWindowModality(Qt.WindowModality.NonModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.canceled.connect(self.cancel_export)
+        self.export_progress.show()
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.is_interrupted = True
+            self.export_progress.setLabelText("Annullamento...")
+
+    def export_step(self, stats):
+        if self.export_progress is None: return
+        elapsed = max(time.time() - stats["start"], 1e-6)
+        rate = stats["done"] / elapsed
+        eta = f"{(stats['total'] - stats['done']) / rate:.0f} s" if rate > 0 else "--"
+        self.export_progress.setValue(stats["done"])
+        self.export_progress.setLabelText(f"{stats['done']}/{stats['total']} righe  {rate:.0f} righe/s  "
+                                          f"{stats['bytes'] / elapsed / 2 ** 20:.1f} MB/s  ETA {eta}"
+                                          + (f"\nErrori: {stats['errors']}" if stats["errors"] else ""))
+
+    def end_export(self):
+        worker, self.export_worker = self.export_worker, None
+        self.running_workers.discard(worker)
+        # export_worker già azzerato: la chiusura del dialogo (che emette 'canceled') non annulla nulla
+        if self.export_progress is not None:
+            self.export_progress.close()
+            self.export_progress = None
+        return worker
+
+    def export_done(self, stats):
+        worker = self.end_export()
+        elapsed = max(stats["elapsed"], 1e-6)
+        errors = sum(stats["errors"].values())
+        summary = (f"{stats['done']} righe in {elapsed:.1f} s ({stats['done'] / elapsed:.0f} righe/s, "
+                   f"{stats['bytes'] / elapsed / 2 ** 20:.1f} MB/s)" + (f", {errors} senza immagine" if errors else ""))
+        if stats["cancelled"]:
+            self.status.showMessage(f"Esportazione annullata dopo {summary}")
+        else:
+            self.status.showMessage(f"Esportate {summary} in {worker.target}")
+
+    def export_failed(self, message):
+        self.end_export()
+        QMessageBox.critical(self, "Errore esportazione", message)
+
+    def on_item_clicked(self, index):
+        self.show_details(self.df_full.iloc[index.data(ThumbnailModel.RowIdRole)])
 
     def prev_page(self):
         if self.current_page > 1: self.load_page(self.current_page - 1)
@@ -523,7 +2794,8 @@ class MainWindow(QMainWindow):
         if self.current_page < self.total_pages: self.load_page(self.current_page + 1)
     
     def show_details(self, row):
-        dlg = DetailDialog(row, self.img_col, self.load_mode, self)
+        # Il blob viene letto dalla finestra stessa, solo per la singola riga ispezionata
+        dlg = DetailDialog(row, self.img_col, self.load_mode, self.dataset, self)
         dlg.exec()
 
 if __name__ == "__main__":
@@ -538,6 +2810,6 @@ if __name__ == "__main__":
         app_icon = QIcon.fromTheme("applications-graphics")
     app.setWindowIcon(app_icon)
 
-    window = MainWindow()
+    window = MainWindow(sys.argv[1] if len(sys.argv) > 1 else None)
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
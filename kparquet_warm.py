@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Riscaldamento headless della cache di Parquet Media Manager.
+
+Decodifica tutte le miniature di un dataset (file, cartella o glob) in un pool di
+processi e precalcola gli indici di ricerca e ordinamento, negli stessi percorsi
+usati dall'interfaccia. Nessun widget Qt: può girare su una macchina senza display.
+
+Interrompibile con Ctrl+C: rilanciando riparte dalle miniature mancanti.
+
+    python kparquet_warm.py data/              # oppure: ./start.sh --warm data/
+    python kparquet_warm.py "data/train-*.parquet" --workers 16 --cache-mb 8192
+"""
+import argparse
+import multiprocessing
+import shutil
+import signal
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt6.QtCore import QSettings
+
+from kparquet import (APP_NAME, ORG_NAME, DECODE_WORKERS, INDEX_CACHE_MB, THUMB_CACHE_MB, ParquetDataset,
+                      SearchEngine, SortIndex, ThumbnailCache, detect_image_columns, index_dir, is_sortable_type,
+                      is_text_type, prune_indices, thumbnail_job)
+
+WRITE_BATCH = 256  # Miniature per transazione SQLite
+
+
+class Progress:
+    """Riga di avanzamento con immagini/s ed ETA (su terminale si riscrive, altrimenti una riga ogni 10 s)."""
+
+    def __init__(self, total, done=0):
+        self.total = total
+        self.done = done          # Già in cache prima di iniziare
+        self.decoded = 0          # Decodificate in questa esecuzione
+        self.errors = Counter()
+        self.start = time.time()
+        self.last = 0.0
+        self.tty = sys.stderr.isatty()
+
+    def rate(self):
+        return self.decoded / max(time.time() - self.start, 1e-6)
+
+    def update(self, force=False):
+        now = time.time()
+        if not force and now - self.last < (0.5 if self.tty else 10): return
+        self.last = now
+        rate = self.rate()
+        left = self.total - self.done
+        eta = f"{left / rate / 60:.1f} min" if rate > 0 else "--"
+        line = (f"[{self.done}/{self.total}] {100 * self.done / max(self.total, 1):5.1f}%  "
+                f"{rate:7.1f} img/s  errori {sum(self.errors.values())}  ETA {eta}")
+        print(("\r" + line) if self.tty else line, end="" if self.tty else "\n", file=sys.stderr, flush=True)
+
+    def finish(self):
+        self.update(force=True)
+        if self.tty:
+            print(file=sys.stderr)
+
+
+def warm_thumbnails(dataset, meta_table, img_col, mode, cache, fp, workers):
+    """Miniature mancanti, row group per row group, con al più poche decodifiche in volo per processo."""
+    todo = []
+    for g in range(dataset.num_row_groups):
+        start, stop = int(dataset.rg_offsets[g]), int(dataset.rg_offsets[g + 1])
+        present = cache.present(fp, start, stop)
+        if len(present) < stop - start:
+            todo.append((g, start, stop, present))
+    progress = Progress(dataset.num_rows, dataset.num_rows - sum(stop - start - len(p) for _, start, stop, p in todo))
+    print(f"Miniature: {progress.done}/{dataset.num_rows} già in cache", file=sys.stderr)
+    if not todo:
+        return progress
+
+    # I figli ignorano Ctrl+C: l'interruzione la gestisce il processo principale
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+    pending, written = deque(), []
+
+    def collect(block):
+        row, future = pending.popleft()
+        if block or future.done():
+            data, error = future.result()
+            if data is not None:
+                written.append((row, data))
+                progress.decoded += 1
+            else:
+                progress.errors[error] += 1
+            progress.done += 1
+            if len(written) >= WRITE_BATCH:
+                cache.put_many(fp, written)
+                written.clear()
+            progress.update()
+            return True
+        pending.appendleft((row, future))
+        return False
+
+    try:
+        for g, start, stop, present in todo:
+            rows = [r for r in range(start, stop) if r not in present]
+            # In modalità bytes si legge dal file la sola colonna immagine del row group
+            if mode == 'bytes':
+                values = dataset.read_row_group(g, [img_col]).column(0).to_pylist()
+                cells = [values[r - start] for r in rows]
+            else:
+                cells = meta_table.column(img_col).slice(start, stop - start).to_pylist()
+                cells = [cells[r - start] for r in rows]
+            for row, cell in zip(rows, cells):
+                pending.append((row, pool.submit(thumbnail_job, cell, mode)))
+                while len(pending) >= workers * 4:
+                    collect(block=True)
+                while pending and collect(block=False):
+                    pass
+        while pending:
+            collect(block=True)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+        cache.put_many(fp, written)
+        progress.finish()
+    return progress
+
+
+def warm_indices(meta_table, directory):
+    started = time.time()
+    engine = SearchEngine(meta_table)
+    if engine.load_index(directory):
+        print("Indice di ricerca: già presente", file=sys.stderr)
+    else:
+        engine.build_index()
+        engine.save_index(directory)
+        print(f"Indice di ricerca: {len(engine.trigrams[0])} trigrammi su {', '.join(engine.indexed_columns) or '-'} "
+              f"({time.time() - started:.1f} s)", file=sys.stderr)
+
+    # Le stesse chiavi che l'interfaccia offre nel menu di ordinamento
+    started = time.time()
+    sort_index = SortIndex(meta_table, directory=directory)
+    keys = [(f.name, order) for f in meta_table.schema if is_sortable_type(f.type)
+            for order in ("ascending", "descending")]
+    for key in keys:
+        sort_index.rank(key)
+    print(f"Ordinamenti: {len(keys)} chiavi ({time.time() - started:.1f} s)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcola miniature e indici di un dataset parquet.")
+    parser.add_argument("source", nargs="+", help="file, cartella o glob (più file = un unico dataset)")
+    parser.add_argument("--column", help="colonna immagine (predefinita: riconoscimento automatico)")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="processi di decodifica")
+    parser.add_argument("--cache-mb", type=int,
+                        help="limite della cache miniature (predefinito: impostazioni; se più alto vale anche per il viewer)")
+    parser.add_argument("--no-thumbnails", action="store_true", help="solo indici")
+    parser.add_argument("--no-index", action="store_true", help="solo miniature")
+    parser.add_argument("--force", action="store_true", help="ricostruisce gli indici già presenti")
+    args = parser.parse_args(argv)
+
+    source = args.source[0] if len(args.source) == 1 else args.source
+    # Ogni row group si legge una volta sola: basta una cache piccola
+    dataset = ParquetDataset(source, cache_mb=64)
+    if args.column:
+        if args.column not in dataset.columns:
+            print(f"Colonna inesistente: {args.column}", file=sys.stderr)
+            return 2
+        img_col = args.column
+        mode = 'path' if is_text_type(dataset.schema.field(img_col).type) else 'bytes'
+    else:
+        candidates = detect_image_columns(dataset)
+        if not candidates:
+            print("Nessuna colonna immagine trovata (usa --column).", file=sys.stderr)
+            return 2
+        img_col, mode = candidates[0]
+        if len(candidates) > 1:
+            print(f"Colonne immagine: {', '.join(c for c, _ in candidates)} (scegli con --column)", file=sys.stderr)
+    meta_table = dataset.read_metadata(img_col)
+    fp = dataset.fingerprint(img_col)
+    print(f"{dataset.num_rows} righe in {len(dataset.paths)} file, colonna '{img_col}' ({mode})", file=sys.stderr)
+
+    try:
+        settings = QSettings(ORG_NAME, APP_NAME)
+        if not args.no_index:
+            directory = index_dir(fp)
+            if args.force:
+                shutil.rmtree(directory, ignore_errors=True)
+            warm_indices(meta_table, directory)
+            # Stesso limite del viewer; gli indici appena calcolati restano comunque
+            freed = prune_indices(int(settings.value("index_cache_mb", INDEX_CACHE_MB)), keep=directory)
+            if freed:
+                print(f"Indici di altri dataset rimossi: {freed / 2 ** 20:.0f} MB", file=sys.stderr)
+        if not args.no_thumbnails:
+            configured = int(settings.value("thumb_cache_mb", THUMB_CACHE_MB))
+            cache_mb = args.cache_mb or configured
+            if cache_mb > configured:
+                # Il viewer riapre la cache con questo limite: se restasse più basso sfratterebbe il riscaldamento
+                settings.setValue("thumb_cache_mb", cache_mb)
+                print(f"Limite della cache miniature del viewer portato da {configured} a {cache_mb} MB",
+                      file=sys.stderr)
+            cache = ThumbnailCache(max_mb=cache_mb)
+            progress = warm_thumbnails(dataset, meta_table, img_col, mode, cache, fp, max(1, args.workers))
+            elapsed = time.time() - progress.start
+            print(f"Decodificate {progress.decoded} immagini in {elapsed:.1f} s ({progress.rate():.1f} img/s)",
+                  file=sys.stderr)
+            for error, count in progress.errors.most_common():
+                print(f"  {error}: {count}", file=sys.stderr)
+            # Se il limite è troppo basso le prime miniature sono già state sfrattate
+            cached = len(cache.present(fp, 0, dataset.num_rows))
+            if cached + sum(progress.errors.values()) < dataset.num_rows:
+                print(f"Attenzione: in cache solo {cached}/{dataset.num_rows} miniature, "
+                      f"aumenta --cache-mb (ora {cache_mb} MB)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\nInterrotto: rilancia lo stesso comando per riprendere.", file=sys.stderr)
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
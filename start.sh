@@ -1,11 +1,11 @@
 #!/bin/bash
 
-# Ottieni la cartella dove si trova questo script
+# Ottieni la cartella dove si trova questo script. Niente cd: i percorsi relativi
+# passati come argomenti restano relativi alla cartella da cui lo si lancia
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
-cd "$DIR"
 
 # Nome della cartella del virtual environment
-VENV_DIR=".venv"
+VENV_DIR="$DIR/.venv"
 
 # 1. Controlla se il venv esiste, altrimenti crealo
 if [ ! -d "$VENV_DIR" ]; then
@@ -20,8 +20,8 @@ if [ ! -d "$VENV_DIR" ]; then
     pip install --upgrade pip
     
     # Installa le librerie dal requirements.txt
-    if [ -f "requirements.txt" ]; then
-        pip install -r requirements.txt
+    if [ -f "$DIR/requirements.txt" ]; then
+        pip install -r "$DIR/requirements.txt"
     else
         echo "ERRORE: requirements.txt non trovato!"
         exit 1
@@ -34,7 +34,13 @@ else
 fi
 
 # 2. Lancia l'applicazione Python (il nome del file deve corrispondere al tuo)
-python kparquet.py
+#    "--warm" come primo argomento: precalcolo headless di miniature e indici
+if [ "$1" == "--warm" ]; then
+    shift
+    python "$DIR/kparquet_warm.py" "$@"
+else
+    python "$DIR/kparquet.py" "$@"
+fi
 
 # Disattiva alla chiusura (opzionale, lo script termina comunque)
 deactivate
\ No newline at end of file